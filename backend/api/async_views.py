@@ -0,0 +1,74 @@
+"""Асинхронные обёртки горячих эндпоинтов чтения для ASGI.
+
+В Django 3.2 нет асинхронного ORM, а DRF работает синхронно, поэтому
+вьюсеты выполняются в отдельном пуле из ASYNC_VIEW_THREADS потоков.
+Синхронные вьюхи Django под ASGI выполняет в одном общем потоке, а
+здесь запросы обрабатываются параллельно, не блокируя цикл событий.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEW_THREADS,
+    thread_name_prefix='async-view',
+)
+
+
+def run_view(view, request, *args, **kwargs):
+    # У каждого потока пула своё соединение с базой; закрываем
+    # устаревшие так же, как Django делает на границах запроса.
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response = response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def as_async_view(view):
+    """Оборачивает синхронную вьюху в корутину, работающую в пуле."""
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Контекст (реплика для чтения и т.п.) передаётся в поток.
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            executor,
+            functools.partial(
+                context.run, run_view, view, request, *args, **kwargs
+            ),
+        )
+
+    return async_view
+
+
+LIST_ACTIONS = {'get': 'list', 'post': 'create'}
+DETAIL_ACTIONS = {
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}
+READ_ONLY_LIST_ACTIONS = {'get': 'list'}
+READ_ONLY_DETAIL_ACTIONS = {'get': 'retrieve'}
+
+recipe_list = as_async_view(RecipeViewSet.as_view(LIST_ACTIONS))
+recipe_detail = as_async_view(RecipeViewSet.as_view(DETAIL_ACTIONS))
+ingredient_list = as_async_view(
+    IngredientViewSet.as_view(READ_ONLY_LIST_ACTIONS)
+)
+ingredient_detail = as_async_view(
+    IngredientViewSet.as_view(READ_ONLY_DETAIL_ACTIONS)
+)
+tag_list = as_async_view(TagViewSet.as_view(READ_ONLY_LIST_ACTIONS))
+tag_detail = as_async_view(TagViewSet.as_view(READ_ONLY_DETAIL_ACTIONS))
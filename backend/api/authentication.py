@@ -0,0 +1,115 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_KEY = 'foodgram:auth-token:{}'
+
+
+def get_token_cache_key(key):
+    return TOKEN_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+class TokenSnapshotCache:
+    """LRU-кеш снимков токенов с пользователями в памяти процесса.
+
+    Записи живут AUTH_TOKEN_LOCAL_TIMEOUT секунд: удаление токена в
+    другом процессе сбрасывает только общий кеш, поэтому здесь оно
+    становится видно не позже этого срока.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, cache_key):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry[1]
+
+    def set(self, cache_key, snapshot, timeout):
+        if not timeout:
+            return
+        with self._lock:
+            self._entries[cache_key] = (time.monotonic() + timeout, snapshot)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, cache_key):
+        with self._lock:
+            self._entries.pop(cache_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_snapshot_cache = TokenSnapshotCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+
+def invalidate_token(key):
+    cache_key = get_token_cache_key(key)
+    token_snapshot_cache.delete(cache_key)
+    cache.delete(cache_key)
+
+
+def invalidate_user_tokens(user_id):
+    for key in Token.objects.filter(
+        user_id=user_id
+    ).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к базе на каждый вызов API.
+
+    Токен с пользователем хранится в памяти процесса и в общем кеше
+    Django. Записи удаляются при выходе, изменении или удалении
+    пользователя (api.signals).
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        snapshot = token_snapshot_cache.get(cache_key)
+        if snapshot is None:
+            snapshot = cache.get(cache_key)
+            if snapshot is None:
+                snapshot = self.load_snapshot(key)
+                cache.set(
+                    cache_key, snapshot, settings.AUTH_TOKEN_CACHE_TIMEOUT
+                )
+            token_snapshot_cache.set(
+                cache_key, snapshot, settings.AUTH_TOKEN_LOCAL_TIMEOUT
+            )
+        # Каждому запросу — своя копия, чтобы изменения пользователя
+        # в одном запросе не попали в кеш.
+        token = pickle.loads(snapshot)
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return token.user, token
+
+    def load_snapshot(self, key):
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return pickle.dumps(token, pickle.HIGHEST_PROTOCOL)
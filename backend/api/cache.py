@@ -0,0 +1,162 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from foodgram.metrics import counters
+from recipes.versions import (
+    get_author_namespace,
+    get_ordering_namespace,
+    get_tag_namespace,
+    get_version,
+)
+from .filters import RECIPE_ORDERINGS
+
+RECIPE_LIST_KEY = 'foodgram:recipe-list:{}'
+
+
+class ReferenceDataCache:
+    """LRU-кеш готовых JSON-ответов справочников в памяти процесса.
+
+    Каждая запись помнит версию пространства имён из общего кеша;
+    при смене версии запись считается устаревшей и рендерится заново.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, namespace, key, render):
+        """Возвращает (etag, body) для ключа, вызывая render при промахе."""
+        version = get_version(namespace)
+        cache_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(cache_key)
+                return entry[1], entry[2]
+
+        body = render()
+        etag = quote_etag(hashlib.md5(body).hexdigest())
+        with self._lock:
+            self._entries[cache_key] = (version, etag, body)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return etag, body
+
+
+reference_data_cache = ReferenceDataCache()
+
+
+class ReferenceDataCacheMixin:
+    """Отдаёт list/retrieve справочника из ReferenceDataCache.
+
+    Поддерживает If-None-Match: при совпадении ETag возвращается 304
+    без обращения к базе данных и сериализаторам.
+    """
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, lambda: super(ReferenceDataCacheMixin, self).list(
+                request, *args, **kwargs
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, lambda: super(ReferenceDataCacheMixin, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
+
+    def get_cached_response(self, request, get_response):
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return get_response()
+
+        def render():
+            return request.accepted_renderer.render(
+                get_response().data,
+                request.accepted_media_type,
+                self.get_renderer_context()
+            )
+
+        key = '?'.join((
+            request.path,
+            urlencode(sorted(request.query_params.lists()), doseq=True)
+        ))
+        etag, body = reference_data_cache.get(
+            self.cache_namespace, key, render
+        )
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+
+class RecipeListCacheMixin:
+    """Кеширует готовый JSON списка рецептов для анонимных запросов.
+
+    Ключ складывается из нормализованных query-параметров и версий
+    данных, от которых зависит выдача: списка автора, если задан
+    author, иначе списков выбранных тегов, иначе общей версии рецептов.
+    Поэтому изменение рецепта сбрасывает только затронутые списки.
+    """
+    # Для анонимов фильтры по избранному и покупкам ничего не меняют.
+    ignored_query_params = ('is_favorited', 'is_in_shopping_cart')
+
+    def list(self, request, *args, **kwargs):
+        if (request.user.is_authenticated
+                or not isinstance(request.accepted_renderer, JSONRenderer)):
+            return super().list(request, *args, **kwargs)
+
+        key = self.get_list_cache_key(request)
+        body = cache.get(key)
+        if body is None:
+            counters.increment('recipe_list_cache_misses')
+            response = super().list(request, *args, **kwargs)
+            body = request.accepted_renderer.render(
+                response.data,
+                request.accepted_media_type,
+                self.get_renderer_context()
+            )
+            cache.set(key, body, settings.RECIPE_LIST_CACHE_TIMEOUT)
+            cache_status = 'MISS'
+        else:
+            counters.increment('recipe_list_cache_hits')
+            cache_status = 'HIT'
+        response = HttpResponse(body, content_type='application/json')
+        response['X-Cache'] = cache_status
+        return response
+
+    def get_list_cache_key(self, request):
+        params = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+            if name not in self.ignored_query_params
+        )
+        if author := request.query_params.get('author'):
+            namespaces = [get_author_namespace(author)]
+        elif tags := request.query_params.getlist('tags'):
+            namespaces = [get_tag_namespace(slug) for slug in sorted(tags)]
+        else:
+            namespaces = ['recipes.recipe']
+        ordering = request.query_params.get('ordering')
+        if ordering in RECIPE_ORDERINGS:
+            namespaces.append(get_ordering_namespace(ordering))
+        namespaces += ['tags', 'ingredients']
+        versions = [get_version(namespace) for namespace in namespaces]
+        return RECIPE_LIST_KEY.format(hashlib.md5(
+            f'{request.path}:{params}:{versions}'.encode()
+        ).hexdigest())
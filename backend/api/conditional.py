@@ -0,0 +1,80 @@
+import hashlib
+from urllib.parse import urlencode
+
+from recipes.models import Recipe
+from recipes.versions import (
+    get_ordering_namespace,
+    get_user_namespace,
+    get_version,
+)
+from .filters import RECIPE_ORDERINGS
+
+
+def get_user_version(request):
+    """Версия избранного, покупок и подписок пользователя запроса."""
+    user = request.user
+    if user.is_anonymous:
+        return None
+    return get_version(get_user_namespace(user.pk))
+
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def get_reference_versions():
+    """Версии тегов и ингредиентов, которые встроены в ответ рецепта."""
+    return get_version('tags'), get_version('ingredients')
+
+
+def get_recipe_updated(request, pk):
+    """Время изменения рецепта, один запрос на HTTP-запрос."""
+    http_request = getattr(request, '_request', request)
+    if not hasattr(http_request, '_recipe_updated'):
+        # Роутер пропускает и нечисловой id: без даты 404 ответит
+        # get_object() во вьюсете.
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            http_request._recipe_updated = None
+            return None
+        http_request._recipe_updated = Recipe.objects.filter(
+            pk=pk
+        ).values_list('updated', flat=True).first()
+    return http_request._recipe_updated
+
+
+def recipe_etag(request, pk=None):
+    updated = get_recipe_updated(request, pk)
+    if updated is None:
+        return None
+    return make_etag(
+        pk, updated.isoformat(), *get_reference_versions(),
+        request.accepted_media_type,
+        request.user.pk, get_user_version(request)
+    )
+
+
+def recipe_last_modified(request, pk=None):
+    # Флаги избранного и подписок меняются без изменения рецепта,
+    # поэтому Last-Modified отдаётся только анонимным пользователям.
+    # Изменение тега или ингредиента сдвигает updated рецептов с ними
+    # (recipes.signals), так что дата учитывает и их.
+    if request.user.is_authenticated:
+        return None
+    return get_recipe_updated(request, pk)
+
+
+def recipe_list_etag(request, *args, **kwargs):
+    ordering = request.query_params.get('ordering')
+    ordering_version = (
+        get_version(get_ordering_namespace(ordering))
+        if ordering in RECIPE_ORDERINGS else None
+    )
+    return make_etag(
+        get_version(Recipe._meta.label_lower), *get_reference_versions(),
+        ordering_version,
+        urlencode(sorted(request.query_params.lists()), doseq=True),
+        request.accepted_media_type,
+        request.user.pk, get_user_version(request)
+    )
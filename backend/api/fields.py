@@ -0,0 +1,134 @@
+import binascii
+import re
+import uuid
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
+from rest_framework import serializers
+
+BASE64_CHUNK_SIZE = 64 * 1024
+NON_BASE64_CHARS = re.compile(r'[^A-Za-z0-9+/=]')
+SPOOL_MAX_SIZE = 1024 * 1024
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+
+class StreamingBase64ImageField(serializers.ImageField):
+    """Изображение в base64 с декодированием по частям.
+
+    Строка декодируется кусками во временный файл, который уходит на
+    диск при превышении SPOOL_MAX_SIZE. Тип файла и размеры картинки
+    проверяются по первому куску, слишком большие изображения
+    отклоняются до декодирования.
+    """
+    default_error_messages = {
+        'invalid_base64': 'Please upload a valid image.',
+        'invalid_type': "The type of the image couldn't be determined.",
+        'too_large': 'Image size must not exceed {max_size} bytes.',
+        'too_many_pixels': 'Image must not exceed {max_pixels} pixels.',
+    }
+
+    def to_internal_value(self, data):
+        if data in (None, ''):
+            return None
+        if not isinstance(data, str):
+            self.fail('invalid_base64')
+        if ';base64,' in data:
+            data = data.split(';base64,', 1)[1]
+
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if len(data) // 4 * 3 > max_size:
+            self.fail('too_large', max_size=max_size)
+
+        file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        try:
+            extension = self.decode(data, file)
+            content_type = self.verify(file)
+        except Exception:
+            file.close()
+            raise
+        size = file.seek(0, 2)
+        file.seek(0)
+        return UploadedFile(
+            file=file,
+            name=f'{uuid.uuid4()}.{extension}',
+            content_type=content_type,
+            size=size,
+        )
+
+    def decode(self, data, file):
+        """Декодирует base64 в file; возвращает расширение файла."""
+        extension = None
+        leftover = ''
+        for start in range(0, len(data) + 1, BASE64_CHUNK_SIZE):
+            # Переносы строк и прочие символы вне алфавита сдвигают
+            # выравнивание по 4 символа: они отбрасываются, а хвост
+            # куска переходит в следующий.
+            text = leftover + NON_BASE64_CHARS.sub(
+                '', data[start:start + BASE64_CHUNK_SIZE]
+            )
+            if start + BASE64_CHUNK_SIZE < len(data):
+                split = len(text) - len(text) % 4
+                text, leftover = text[:split], text[split:]
+            if not text:
+                continue
+            try:
+                chunk = binascii.a2b_base64(text)
+            except (binascii.Error, ValueError):
+                self.fail('invalid_base64')
+            if extension is None:
+                extension = self.check_header(chunk)
+            file.write(chunk)
+        if extension is None:
+            self.fail('invalid_base64')
+        return extension
+
+    def check_pixels(self, image):
+        width, height = image.size
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        if width * height > max_pixels:
+            self.fail('too_many_pixels', max_pixels=max_pixels)
+
+    def verify(self, file):
+        """Проверяет декодированный файл целиком; возвращает MIME-тип."""
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                self.check_pixels(image)
+                image.verify()
+                return Image.MIME.get(image.format)
+        except serializers.ValidationError:
+            raise
+        except Exception:
+            self.fail('invalid_base64')
+
+    def check_header(self, chunk):
+        """Проверяет сигнатуру и размеры изображения по началу файла."""
+        extension = next(
+            (extension for signature, extension in IMAGE_SIGNATURES
+             if chunk.startswith(signature)),
+            None
+        )
+        if extension is None and chunk[:4] == b'RIFF' \
+                and chunk[8:12] == b'WEBP':
+            extension = 'webp'
+        if extension is None:
+            self.fail('invalid_type')
+
+        try:
+            # Pillow читает только заголовок, пиксели не декодируются.
+            image = Image.open(BytesIO(chunk))
+        except Exception:
+            # Заголовок не поместился в первый кусок — размеры
+            # проверит verify после декодирования.
+            return extension
+        with image:
+            self.check_pixels(image)
+        return extension
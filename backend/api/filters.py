@@ -1,12 +1,26 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Case, F, FloatField, When
+from django.db.models.functions import Cast
 from django_filters.rest_framework import (
     FilterSet,
     AllValuesMultipleFilter,
     BooleanFilter, CharFilter,
+    ChoiceFilter,
 )
 
+from recipes.autocomplete import ingredient_index
 from recipes.models import Recipe, Ingredient
 
 
+# Порядок выдачи рецептов; каждому варианту соответствует индекс.
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
+SEARCH_ORDERING = ('-search_rank', '-id')
+
+
 class RecipeFilter(FilterSet):
     tags = AllValuesMultipleFilter(field_name='tags__slug')
     is_in_shopping_cart = BooleanFilter(
@@ -15,12 +29,18 @@ class RecipeFilter(FilterSet):
     is_favorited = BooleanFilter(
         method='filter_is_favorited'
     )
+    # search объявлен до ordering: явная сортировка важнее релевантности.
+    search = CharFilter(method='filter_search')
+    ordering = ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags',
                   'is_in_shopping_cart',
-                  'is_favorited')
+                  'is_favorited', 'search', 'ordering')
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -34,10 +54,53 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shop_list__user=user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        query = SearchQuery(
+            value,
+            config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        # ts_rank возвращает real; приведение к double precision нужно,
+        # чтобы значение из курсора KeysetPagination совпадало точно.
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(SearchRank(F('search_vector'), query),
+                             FloatField())
+        ).order_by(*SEARCH_ORDERING)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
 
 class IngredientFilter(FilterSet):
-    name = CharFilter(lookup_expr='istartswith')
+    name = CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
+
+    def filter_name(self, queryset, name, value):
+        """Автодополнение: сначала совпадения по началу названия,
+        затем по подстроке."""
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        if settings.INGREDIENT_INDEX_ENABLED:
+            ids = ingredient_index.search(value, limit)
+        else:
+            ids = self.search_in_db(queryset, value, limit)
+        return queryset.filter(pk__in=ids).order_by(
+            Case(*(When(pk=pk, then=position)
+                   for position, pk in enumerate(ids)))
+        )
+
+    @staticmethod
+    def search_in_db(queryset, value, limit):
+        # Поиск по префиксу использует индекс по UPPER(name).
+        ids = list(queryset.filter(
+            name__istartswith=value
+        ).values_list('pk', flat=True)[:limit])
+        if len(ids) < limit:
+            ids += queryset.filter(
+                name__icontains=value
+            ).exclude(
+                name__istartswith=value
+            ).values_list('pk', flat=True)[:limit - len(ids)]
+        return ids
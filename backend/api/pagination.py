@@ -1,7 +1,271 @@
+import hashlib
+import json
+from base64 import b64decode, b64encode
+from datetime import datetime
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import BooleanField, F, Field, Func, Value
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from recipes.versions import get_user_namespace, get_version
+
+COUNT_KEY = 'foodgram:count:{}'
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, кеширующий число объектов для каждого набора фильтров.
+
+    Ключ строится из SQL запроса и версий данных модели и пользователя,
+    поэтому запись устаревает при их изменении или по истечении
+    PAGINATION_COUNT_CACHE_TIMEOUT. Для PostgreSQL при оценке
+    планировщика больше PAGINATION_COUNT_ESTIMATE_THRESHOLD точный
+    COUNT(*) не выполняется.
+    """
+
+    def __init__(self, *args, namespaces=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.namespaces = namespaces
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        sql, params = queryset.query.sql_with_params()
+        versions = [
+            get_version(namespace)
+            for namespace in (queryset.model._meta.label_lower,
+                              *self.namespaces)
+        ]
+        signature = hashlib.md5(
+            f'{versions}:{sql}:{params}'.encode()
+        ).hexdigest()
+        key = COUNT_KEY.format(signature)
+        count = cache.get(key)
+        if count is None:
+            count = self.estimate_count(queryset, sql, params)
+            if count is None:
+                count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    @staticmethod
+    def estimate_count(queryset, sql, params):
+        threshold = settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+        connection = connections[queryset.db]
+        if threshold is None or connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = plan[0]['Plan']['Plan Rows']
+        if estimate < threshold:
+            return None
+        return estimate
+
+
+class Row(Func):
+    """Строковое значение SQL: (a, b, ...)."""
+    template = '(%(expressions)s)'
+    output_field = Field()
+
+
+class KeysetPagination(CursorPagination):
+    """Пагинация по ключу без OFFSET и COUNT(*).
+
+    Порядок берётся из атрибута cursor_ordering вьюсета; все его поля
+    сортируются в одну сторону, последнее уникально, значения не NULL.
+    Курсор хранит значения всех полей порядка у крайней записи
+    страницы, а следующая страница выбирается сравнением строк
+    (a, id) < (a_last, id_last). Поэтому совпадающие значения первого
+    поля, например нулевой рейтинг у большинства рецептов, не ломают
+    переход между страницами.
+    """
+    page_size_query_param = 'limit'
+    page_size = settings.DEFAULT_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(view.cursor_ordering)
+        if len({field.startswith('-') for field in ordering}) > 1:
+            raise ImproperlyConfigured(
+                'Поля cursor_ordering должны сортироваться в одну сторону.'
+            )
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = (
+            (False, None) if self.cursor is None
+            else (self.cursor.reverse, self.cursor.position)
+        )
+        descending = self.ordering[0].startswith('-') != reverse
+        fields = [field.lstrip('-') for field in self.ordering]
+        if position is not None:
+            position = self.clean_position(queryset, fields, position)
+            queryset = queryset.filter(Func(
+                Row(*map(F, fields)),
+                Row(*map(Value, position)),
+                template='%(expressions)s',
+                arg_joiner=' < ' if descending else ' > ',
+                output_field=BooleanField(),
+            ))
+        queryset = queryset.order_by(*(
+            f'-{field}' if descending else field for field in fields
+        ))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def clean_position(self, queryset, fields, position):
+        """Приводит значения из курсора к типам полей порядка.
+
+        Курсор приходит от клиента: неподходящие значения должны давать
+        404, а не ошибку базы данных.
+        """
+        if len(position) != len(fields):
+            raise NotFound(self.invalid_cursor_message)
+        values = []
+        for name, value in zip(fields, position):
+            if (isinstance(value, bool)
+                    or not isinstance(value, (str, int, float))):
+                raise NotFound(self.invalid_cursor_message)
+            annotation = queryset.query.annotations.get(name)
+            field = (
+                annotation.output_field if annotation is not None
+                else queryset.model._meta.get_field(name)
+            )
+            try:
+                values.append(field.to_python(value))
+            except (ValidationError, OverflowError):
+                raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_position(self, instance):
+        return [
+            self._get_position_from_instance(instance, [field])
+            for field in self.ordering
+        ]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Перед позицией курсора записей нет: дальше идёт
+            # первая страница.
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False, position=self.get_position(self.page[-1])
+        ))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        # После позиции курсора записей нет: назад идёт последняя
+        # страница.
+        position = self.get_position(self.page[0]) if self.page else None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True, position=position
+        ))
+
+    def _get_position_from_instance(self, instance, ordering):
+        field_name = ordering[0].lstrip('-')
+        if isinstance(instance, dict):
+            value = instance[field_name]
+        else:
+            value = getattr(instance, field_name)
+        # isoformat сохраняет микросекунды, которые отбрасывает
+        # DjangoJSONEncoder.
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(b64decode(encoded.encode('ascii')))
+            reverse = bool(data.get('r'))
+            position = data.get('p')
+        except (TypeError, ValueError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        if position is not None and not isinstance(position, list):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        data = {'r': int(cursor.reverse), 'p': cursor.position}
+        encoded = b64encode(
+            json.dumps(data).encode()
+        ).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
 
 
 class CustomPageNumberPagination(PageNumberPagination):
+    """Постраничная пагинация с режимом курсора по запросу.
+
+    Параметр pagination=cursor (или уже полученный cursor) включает
+    KeysetPagination; по умолчанию ответ остаётся постраничным.
+    """
     page_size_query_param = 'limit'
     page_size = settings.DEFAULT_PAGE_SIZE
+    mode_query_param = 'pagination'
+    keyset_paginator = None
+
+    def use_keyset(self, request, view):
+        return (getattr(view, 'cursor_ordering', None) is not None
+                and (request.query_params.get(self.mode_query_param)
+                     == 'cursor'
+                     or KeysetPagination.cursor_query_param
+                     in request.query_params))
+
+    def django_paginator_class(self, object_list, per_page):
+        # Фильтры по избранному, покупкам и подпискам зависят
+        # от пользователя, поэтому его версия входит в ключ счётчика.
+        user = self.request.user
+        namespaces = (
+            (get_user_namespace(user.pk),) if user.is_authenticated else ()
+        )
+        return CachedCountPaginator(
+            object_list, per_page, namespaces=namespaces
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request, view):
+            self.keyset_paginator = KeysetPagination()
+            return self.keyset_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        self.request = request
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,111 @@
+import csv
+import os
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ShopListRenderer(BaseRenderer):
+    """Базовый рендерер файла со списком покупок.
+
+    Строки списка передаются итератором, а файл отдаётся по частям
+    через render_stream, поэтому память не зависит от размера списка.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Используется только для ответов с ошибками.
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return str(data).encode('utf-8')
+
+    def render_stream(self, rows):
+        raise NotImplementedError(
+            'ShopListRenderer.render_stream() must be implemented.'
+        )
+
+    @staticmethod
+    def format_row(row):
+        return (row['ingredient__name'].capitalize(),
+                row['total_amount'],
+                row['ingredient__measurement_unit'])
+
+
+class PlainTextShopListRenderer(ShopListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def render_stream(self, rows):
+        for idx, row in enumerate(rows, start=1):
+            name, amount, unit = self.format_row(row)
+            yield f'{idx}. {name}, {amount} {unit}\n'.encode(self.charset)
+
+
+class Echo:
+    """Псевдобуфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CSVShopListRenderer(ShopListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('Ингредиент', 'Количество', 'Единица измерения')
+
+    def render_stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.header).encode(self.charset)
+        for row in rows:
+            yield writer.writerow(self.format_row(row)).encode(self.charset)
+
+
+class PDFShopListRenderer(ShopListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShopListFont'
+    font_size = 12
+    margin = 50
+
+    def get_font_name(self):
+        font_path = settings.SHOP_LIST_PDF_FONT
+        if not os.path.exists(font_path):
+            # Стандартный шрифт не поддерживает кириллицу.
+            return 'Helvetica'
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(self.font_name, font_path))
+        return self.font_name
+
+    def render_stream(self, rows):
+        font_name = self.get_font_name()
+        line_height = self.font_size * 1.5
+        width, height = A4
+        # Документ пишется во временный файл, который уходит на диск,
+        # если список покупок не помещается в память.
+        with SpooledTemporaryFile(max_size=STREAM_CHUNK_SIZE) as file:
+            pdf = canvas.Canvas(file, pagesize=A4)
+            pdf.setTitle('Список покупок')
+            pdf.setFont(font_name, self.font_size)
+            y = height - self.margin
+            for idx, row in enumerate(rows, start=1):
+                if y < self.margin:
+                    pdf.showPage()
+                    pdf.setFont(font_name, self.font_size)
+                    y = height - self.margin
+                name, amount, unit = self.format_row(row)
+                pdf.drawString(
+                    self.margin, y, f'{idx}. {name}, {amount} {unit}'
+                )
+                y -= line_height
+            pdf.save()
+            file.seek(0)
+            while chunk := file.read(STREAM_CHUNK_SIZE):
+                yield chunk
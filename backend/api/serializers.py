@@ -1,7 +1,7 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from djoser.serializers import UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueTogetherValidator
@@ -11,9 +11,13 @@ from recipes.models import (
     Tag, Ingredient,
     RecipeIngredient,
     Recipe, FavoriteRecipe,
-    ShopList
+    ShopList, ShopListIngredient
 )
+from recipes.images import get_image_urls, schedule_variants
+from recipes.search import update_search_fields
 from recipes.validators import validate_color
+from .fields import StreamingBase64ImageField
+from .utils import get_following_ids, get_recipes_limit
 
 User = get_user_model()
 
@@ -66,7 +70,7 @@ class CustomUserSerializer(UserSerializer):
         request = self.context.get('request')
         return (request
                 and request.user.is_authenticated
-                and request.user.following.filter(author=obj).exists())
+                and obj.id in get_following_ids(request))
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -82,6 +86,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.BooleanField(default=False)
     is_in_shopping_cart = serializers.BooleanField(default=False)
     image = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -94,6 +99,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time',
         )
@@ -102,6 +108,27 @@ class RecipeSerializer(serializers.ModelSerializer):
         if obj.image:
             return obj.image.url
 
+    def get_images(self, obj):
+        return get_image_urls(obj)
+
+
+class MatchedRecipeSerializer(RecipeSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    matched_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'coverage', 'matched_count'
+        )
+
+
+class IngredientMatchSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_MATCH_MAX_INGREDIENTS,
+    )
+
 
 class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
     id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
@@ -120,7 +147,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         many=True,
         queryset=Tag.objects.all()
     )
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -185,19 +212,82 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
         # Добавляем ингредиенты
         self.add_ingredients(ingredients_data, recipe)
+        update_search_fields(Recipe.objects.filter(pk=recipe.pk))
         recipe.tags.add(*tags_data)
+        schedule_variants(recipe)
         return recipe
 
+    @staticmethod
+    def update_ingredients(ingredients_data, recipe):
+        """Применяет к ингредиентам рецепта только изменения.
+
+        Возвращает количества ингредиентов до и после изменения.
+        """
+        recipe_ingredients = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        old_amounts = {
+            ingredient_id: recipe_ingredient.amount
+            for ingredient_id, recipe_ingredient
+            in recipe_ingredients.items()
+        }
+        new_amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients_data
+        }
+
+        ingredients_to_create = []
+        ingredients_to_update = []
+        for ingredient_id, amount in new_amounts.items():
+            recipe_ingredient = recipe_ingredients.get(ingredient_id)
+            if recipe_ingredient is None:
+                ingredients_to_create.append(RecipeIngredient(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=amount
+                ))
+            elif recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                ingredients_to_update.append(recipe_ingredient)
+        ids_to_delete = [
+            recipe_ingredients[ingredient_id].id
+            for ingredient_id in old_amounts.keys() - new_amounts.keys()
+        ]
+
+        if ids_to_delete:
+            RecipeIngredient.objects.filter(id__in=ids_to_delete).delete()
+        if ingredients_to_update:
+            RecipeIngredient.objects.bulk_update(
+                ingredients_to_update, ['amount']
+            )
+        if ingredients_to_create:
+            RecipeIngredient.objects.bulk_create(ingredients_to_create)
+        return old_amounts, new_amounts
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
-        instance.ingredients.clear()
-        instance.tags.clear()
-        self.add_ingredients(ingredients_data, instance)
-        instance.tags.add(*tags_data)
+        old_amounts, new_amounts = self.update_ingredients(
+            ingredients_data, instance
+        )
+        ShopListIngredient.objects.update_recipe(
+            instance, old_amounts, new_amounts
+        )
+        instance.tags.set(tags_data)
+        if 'image' in validated_data:
+            validated_data['image_variants_ready'] = False
+            schedule_variants(instance)
+        # search_vector с новыми ингредиентами пересчитает post_save.
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        # Перечитываем рецепт, чтобы ингредиенты и теги загрузились
+        # фиксированным числом запросов вместе с флагами пользователя.
+        instance = Recipe.objects.for_listing(
+            self.context['request'].user
+        ).get(pk=instance.pk)
         response_serializer = RecipeSerializer(
             instance,
             context=self.context
@@ -207,37 +297,39 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
     def get_image(self, obj):
         if obj.image:
             return obj.image.url
 
+    def get_images(self, obj):
+        return get_image_urls(obj)
+
 
 class FollowUserSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta(CustomUserSerializer.Meta):
         fields = (CustomUserSerializer.Meta.fields
                   + ('recipes', 'recipes_count'))
 
     def get_recipes(self, obj):
-        queryset = obj.recipes.all()
-        if recipes_limit := self.context['request'].query_params.get(
-                'recipes_limit'
-        ):
-            queryset = queryset[:int(recipes_limit)]
+        # Превью, подготовленные во вьюхе подписок одним запросом
+        queryset = getattr(obj, 'preview_recipes', None)
+        if queryset is None:
+            queryset = obj.recipes.all()
+            if recipes_limit := get_recipes_limit(self.context['request']):
+                queryset = queryset[:recipes_limit]
 
         # Используем FavoriteRecipeSerializer для сериализации рецептов
         return ShortRecipeSerializer(queryset, many=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class FollowCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user_tokens
+
+User = get_user_model()
+
+
+# Выход через djoser (token/logout) и удаление пользователя удаляют токен.
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_changed_user(sender, instance, created, update_fields=None,
+                            **kwargs):
+    # Смена пароля, блокировка и правка профиля меняют снимок
+    # пользователя; обновление last_login при входе — нет.
+    if created or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    invalidate_user_tokens(instance.pk)
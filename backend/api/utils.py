@@ -0,0 +1,20 @@
+def get_following_ids(request):
+    """Возвращает id авторов, на которых подписан пользователь запроса.
+
+    Множество загружается одним запросом и сохраняется на HttpRequest,
+    поэтому все сериализаторы в рамках запроса используют его повторно.
+    """
+    http_request = getattr(request, '_request', request)
+    if not hasattr(http_request, '_following_ids'):
+        http_request._following_ids = set(
+            request.user.following.values_list('author_id', flat=True)
+        )
+    return http_request._following_ids
+
+
+def get_recipes_limit(request):
+    """Возвращает recipes_limit из query-параметров или None."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit and recipes_limit.isdigit():
+        return int(recipes_limit)
+    return None
@@ -1,9 +1,13 @@
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
@@ -13,84 +17,146 @@ from customusers.models import (
 )
 from recipes.models import (
     Tag,
-    RecipeIngredient,
     Ingredient,
     Recipe,
     FavoriteRecipe,
     ShopList,
+    ShopListIngredient,
 )
-from .filters import RecipeFilter, IngredientFilter
-from .pagination import CustomPageNumberPagination
+from .cache import RecipeListCacheMixin, ReferenceDataCacheMixin
+from .conditional import (
+    recipe_etag,
+    recipe_last_modified,
+    recipe_list_etag,
+)
+from .filters import (
+    RECIPE_ORDERINGS,
+    SEARCH_ORDERING,
+    RecipeFilter,
+    IngredientFilter,
+)
+from .pagination import CustomPageNumberPagination, KeysetPagination
 from .permissions import AuthorOrReadOnly
+from .renderers import (
+    PlainTextShopListRenderer,
+    CSVShopListRenderer,
+    PDFShopListRenderer,
+)
 from .serializers import (
     TagSerializer, IngredientSerializer,
     RecipeSerializer, RecipeCreateSerializer,
     FollowUserSerializer, ShopListSerializer,
     FavoriteRecipeSerializer, CustomUserSerializer,
-    FollowCreateSerializer,
+    FollowCreateSerializer, IngredientMatchSerializer,
+    MatchedRecipeSerializer, ShortRecipeSerializer,
 )
+from .utils import get_recipes_limit
+
+SHOP_LIST_CHUNK_SIZE = 500
+FEED_ORDERING = ('-created', '-id')
+MATCH_ORDERING = ('-coverage', '-id')
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReferenceDataCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    cache_namespace = 'tags'
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceDataCacheMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    cache_namespace = 'ingredients'
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(RecipeListCacheMixin, viewsets.ModelViewSet):
     pagination_class = CustomPageNumberPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
     permission_classes = (AuthorOrReadOnly,)
 
+    @property
+    def cursor_ordering(self):
+        if self.action == 'feed':
+            return FEED_ORDERING
+        if self.action == 'match':
+            return MATCH_ORDERING
+        params = self.request.query_params
+        if params.get('ordering') in RECIPE_ORDERINGS:
+            return RECIPE_ORDERINGS[params['ordering']]
+        if params.get('search'):
+            return SEARCH_ORDERING
+        return ('created', 'id')
+
     def get_serializer_class(self):
         if self.action in ['create', 'partial_update']:
             return RecipeCreateSerializer
         return RecipeSerializer
 
     def get_queryset(self):
-        user = self.request.user
-        if user.is_anonymous:
-            return Recipe.objects.all()
-        return Recipe.objects.with_annotations(user)
+        return Recipe.objects.for_listing(self.request.user)
+
+    @method_decorator(condition(etag_func=recipe_list_etag))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(condition(
+        etag_func=recipe_etag,
+        last_modified_func=recipe_last_modified
+    ))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     @staticmethod
     def get_ingredients_data(user):
         """Получает данные об ингредиентах из базы данных."""
-        return RecipeIngredient.objects.filter(
-            recipe__shop_list__user=user
+        return ShopListIngredient.objects.filter(
+            user=user
         ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            total_amount=Sum('amount')
+            'ingredient__name', 'ingredient__measurement_unit',
+            total_amount=F('amount')
         ).order_by('ingredient__name')
 
-    @staticmethod
-    def format_content(ingredients_data):
-        """Формирует содержимое файла на основе данных об ингредиентах."""
-        return "\n".join(
-            f"{idx + 1}. {data['ingredient__name'].capitalize()}, "
-            f"{data['total_amount']} {data['ingredient__measurement_unit']}"
-            for idx, data in enumerate(ingredients_data)
-        )
-
-    @action(detail=False, methods=['GET'], url_path='download_shopping_cart')
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_path='download_shopping_cart',
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            PlainTextShopListRenderer,
+            CSVShopListRenderer,
+            PDFShopListRenderer,
+        ),
+    )
     def download_shopping_cart(self, request):
-        ingredients_data = self.get_ingredients_data(request.user)
-        content = self.format_content(ingredients_data)
+        """Отдаёт список покупок файлом в формате из параметра format."""
+        renderer = request.accepted_renderer
+        ingredients_data = self.get_ingredients_data(
+            request.user
+        ).iterator(chunk_size=SHOP_LIST_CHUNK_SIZE)
+        if isinstance(request._request, ASGIRequest):
+            # Под ASGI Django 3.2 перебирает потоковый ответ в цикле
+            # событий, где запросы к базе запрещены, поэтому строки
+            # читаются здесь, в потоке вьюхи.
+            ingredients_data = list(ingredients_data)
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
 
-        response = HttpResponse(content, content_type='text/plain')
-        response['Content-Disposition'] = ('attachment;'
-                                           ' filename="shop_list.txt"')
+        response = StreamingHttpResponse(
+            renderer.render_stream(ingredients_data),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shop_list.{renderer.format}"'
+        )
         return response
 
+    @transaction.atomic
     def create_relationship(self, recipe_id, serializer_class):
         data = {'user': self.request.user.id, 'recipe': recipe_id}
         serializer = serializer_class(
@@ -102,6 +168,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete_relationship(self, recipe_id, model):
         request = self.request
         recipe = get_object_or_404(Recipe, id=recipe_id)
@@ -116,6 +183,63 @@ class RecipeViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_path='feed',
+        permission_classes=(IsAuthenticated,),
+        pagination_class=KeysetPagination,
+    )
+    def feed(self, request):
+        # Рецепты всех авторов из подписок одним запросом по индексу
+        # (author, created); страницы — по курсору, без OFFSET.
+        queryset = self.filter_queryset(self.get_queryset().filter(
+            author__in=Follow.objects.filter(
+                user=request.user
+            ).values('author')
+        ))
+        page = self.paginate_queryset(queryset)
+        serializer = RecipeSerializer(
+            page,
+            many=True,
+            context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['GET'], url_path='similar')
+    def similar(self, request, pk=None):
+        # Соседи заранее посчитаны recipes.similarity, здесь только чтение.
+        # get_object_or_404 из DRF отвечает 404 и на нечисловой id.
+        recipe = get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+        recipes = Recipe.objects.without_search_fields().filter(
+            similar_to__recipe=recipe
+        ).order_by('-similar_to__score', 'id')
+        serializer = ShortRecipeSerializer(
+            recipes,
+            many=True,
+            context={'request': request}
+        )
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['GET'], url_path='match')
+    def match(self, request):
+        # ?ingredients=1&ingredients=2 — рецепты по доле ингредиентов,
+        # которые уже есть у пользователя.
+        params = IngredientMatchSerializer(data={
+            'ingredients': request.query_params.getlist('ingredients')
+        })
+        params.is_valid(raise_exception=True)
+        queryset = self.filter_queryset(self.get_queryset()).matching(
+            params.validated_data['ingredients']
+        ).order_by(*MATCH_ORDERING)
+        page = self.paginate_queryset(queryset)
+        serializer = MatchedRecipeSerializer(
+            page,
+            many=True,
+            context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['POST', 'DELETE'], url_path='shopping_cart')
     def shop_list(self, request, pk=None):
         if request.method == 'POST':
@@ -133,6 +257,7 @@ class UserViewSet(DjoserUserViewSet):
     queryset = User.objects.all()
     pagination_class = CustomPageNumberPagination
     serializer_class = CustomUserSerializer
+    cursor_ordering = ('id',)
 
     def get_permissions(self):
         if self.action == 'me':
@@ -141,8 +266,19 @@ class UserViewSet(DjoserUserViewSet):
 
     @action(detail=False, methods=['GET'], url_path='subscriptions')
     def get_subscriptions(self, request):
-        # Получаем всех авторов, на которых подписан текущий пользователь
-        users = User.objects.filter(followers__user=request.user)
+        # Получаем всех авторов, на которых подписан текущий пользователь,
+        # вместе с превью их рецептов для всей страницы сразу
+        users = User.objects.filter(
+            followers__user=request.user
+        ).prefetch_related(
+            Prefetch(
+                'recipes',
+                queryset=Recipe.objects.limited_per_author(
+                    get_recipes_limit(request)
+                ),
+                to_attr='preview_recipes'
+            )
+        )
 
         # Получаем информацию о каждом авторе с помощью нашего сериализатора
         page = self.paginate_queryset(users)
@@ -153,6 +289,7 @@ class UserViewSet(DjoserUserViewSet):
         )
         return self.get_paginated_response(serializer.data)
 
+    @transaction.atomic
     def create_relationship(self, user_id, serializer_class):
         author = get_object_or_404(User, id=user_id)
         data = {'user': self.request.user.id, 'author': author.id}
@@ -164,6 +301,7 @@ class UserViewSet(DjoserUserViewSet):
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete_relationship(self, user_id, model):
         request = self.request
         author = get_object_or_404(User, id=user_id)
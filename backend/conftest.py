@@ -0,0 +1,98 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import update_search_fields
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Версии, счётчики страниц и готовые ответы хранятся в кеше.
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        email='user@foodgram.ru',
+        username='user',
+        password='Password-123',
+        first_name='Имя',
+        last_name='Фамилия',
+    )
+
+
+@pytest.fixture
+def author(django_user_model):
+    return django_user_model.objects.create_user(
+        email='author@foodgram.ru',
+        username='author',
+        password='Password-123',
+        first_name='Автор',
+        last_name='Рецептов',
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+@pytest.fixture
+def tags():
+    return Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', color_code=f'#0000{number:02d}',
+            slug=f'tag-{number}')
+        for number in range(3)
+    )
+
+
+@pytest.fixture
+def ingredients():
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+        for number in range(5)
+    )
+
+
+@pytest.fixture
+def create_recipes(author, tags, ingredients):
+    """Создаёт рецепты автора с двумя тегами и тремя ингредиентами."""
+    def create(count):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {number}', text='Описание',
+                   cooking_time=10, image='recipes/images/recipe.png')
+            for number in range(count)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags[:2]
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=10 + number)
+            for recipe in recipes
+            for number, ingredient in enumerate(ingredients[:3])
+        )
+        update_search_fields(
+            Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])
+        )
+        return recipes
+    return create
@@ -5,3 +5,6 @@ class CustomusersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'customusers'
     verbose_name = 'Управление пользователями'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -27,6 +27,14 @@ class User(AbstractUser):
         max_length=MAX_LENGTH_TEXT_FIELD,
         verbose_name='Фамилия',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков',
+    )
 
     USERNAME_FIELD = 'email'
 
@@ -0,0 +1,58 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes.counters import change_counter
+from recipes.models import Recipe, Tag
+from recipes.versions import (
+    bump_recipe_versions,
+    bump_version,
+    get_user_namespace,
+)
+from .models import Follow, User
+
+
+@receiver(post_save, sender=User)
+def invalidate_user(sender, instance, created, update_fields=None,
+                    **kwargs):
+    # Обновление last_login при входе не меняет списки пользователей.
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    bump_version(User._meta.label_lower)
+    if not created:
+        # Профиль автора выводится в каждом его рецепте.
+        Recipe.objects.filter(author=instance).update(
+            updated=timezone.now()
+        )
+        bump_recipe_versions(
+            instance.pk,
+            Tag.objects.filter(
+                recipes__author=instance
+            ).values_list('slug', flat=True).distinct()
+        )
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, **kwargs):
+    bump_version(User._meta.label_lower)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follows(sender, instance, **kwargs):
+    bump_version(get_user_namespace(instance.user_id))
+
+
+@receiver(post_save, sender=Follow)
+def increase_followers_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'followers_count', 1
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def decrease_followers_count(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'followers_count', -1
+    )
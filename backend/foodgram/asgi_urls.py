@@ -0,0 +1,15 @@
+from django.urls import path
+
+from api import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+# Горячие эндпоинты чтения в асинхронном варианте; остальные адреса
+# те же, что и в foodgram.urls.
+urlpatterns = [
+    path('api/recipes/', async_views.recipe_list),
+    path('api/recipes/<int:pk>/', async_views.recipe_detail),
+    path('api/ingredients/', async_views.ingredient_list),
+    path('api/ingredients/<int:pk>/', async_views.ingredient_detail),
+    path('api/tags/', async_views.tag_list),
+    path('api/tags/<int:pk>/', async_views.tag_detail),
+] + sync_urlpatterns
@@ -0,0 +1,31 @@
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с проверкой постоянного соединения перед запросом.
+
+    При CONN_HEALTH_CHECKS соединение, пережившее прошлый запрос
+    (CONN_MAX_AGE), проверяется один раз при первом обращении в новом
+    запросе и при обрыве открывается заново, а не падает с ошибкой.
+    """
+
+    health_check_done = False
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # Вызывается в начале и конце каждого запроса Django.
+        self.health_check_done = False
+
+    def _cursor(self, name=None):
+        if (self.connection is not None
+                and not self.health_check_done
+                and self.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not self.in_atomic_block):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        return super()._cursor(name)
@@ -0,0 +1,296 @@
+"""Метрики запросов: число SQL-запросов, время в базе, сериализаторах
+и общее время ответа.
+
+RequestMetricsMiddleware включается REQUEST_METRICS_ENABLED; если он
+выключен, middleware не подключается вовсе. Значения отдаются в
+заголовке Server-Timing и гистограммами Prometheus на /metrics.
+Гистограммы и счётчики (например, попаданий в кеш списка рецептов)
+хранятся в памяти процесса: при нескольких воркерах gunicorn каждый
+отдаёт свои значения.
+"""
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+current_stats = ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+    def __init__(self, record_sql):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.sql = [] if record_sql else None
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper для всех соединений: учитывает запрос в метриках
+    текущего HTTP-запроса, если они собираются."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats.queries += 1
+        stats.db_time += duration
+        if stats.sql is not None:
+            stats.sql.append((duration, sql))
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed_data(prop):
+    """Оборачивает свойство data сериализатора DRF: считается время
+    только внешнего сериализатора, вложенные уже входят в него."""
+
+    def data(self):
+        stats = current_stats.get()
+        if stats is None:
+            return prop.fget(self)
+        stats.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            stats.serializer_depth -= 1
+            if not stats.serializer_depth:
+                stats.serializer_time += time.perf_counter() - started
+
+    return property(data)
+
+
+_instrumented = False
+
+
+def instrument():
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+    connection_created.connect(install_query_wrapper)
+    for connection in connections.all():
+        install_query_wrapper(None, connection)
+    for serializer_class in (serializers.Serializer,
+                             serializers.ListSerializer):
+        serializer_class.data = timed_data(serializer_class.data)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0, 0.0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += 1
+        series[2] += value
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for (view, method), (counts, count, total) in sorted(
+            self.series.items()
+        ):
+            labels = f'view="{view}",method="{method}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} '
+                    f'{cumulative}'
+                )
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+        return lines
+
+
+class Counters:
+    """Счётчики событий в памяти процесса, без записи в общий кеш."""
+
+    def __init__(self, names=()):
+        self._lock = threading.Lock()
+        # Известные счётчики отдаются и с нулевым значением.
+        self.values = dict.fromkeys(names, 0)
+
+    def increment(self, name):
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + 1
+
+    def get(self, name):
+        return self.values.get(name, 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self.values.items())
+        lines = []
+        for name, value in values:
+            lines += [
+                f'# TYPE foodgram_{name}_total counter',
+                f'foodgram_{name}_total {value}',
+            ]
+        return lines
+
+
+counters = Counters(
+    ('recipe_list_cache_hits', 'recipe_list_cache_misses')
+)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        seconds = settings.REQUEST_METRICS_BUCKETS
+        self.histograms = (
+            Histogram('foodgram_request_duration_seconds',
+                      'Время ответа', seconds),
+            Histogram('foodgram_request_db_seconds',
+                      'Время SQL-запросов за запрос', seconds),
+            Histogram('foodgram_request_serializer_seconds',
+                      'Время сериализаторов DRF за запрос', seconds),
+            Histogram('foodgram_request_queries',
+                      'Число SQL-запросов за запрос',
+                      (1, 2, 5, 10, 20, 50, 100)),
+        )
+
+    def observe(self, labels, total, stats):
+        values = (
+            total, stats.db_time, stats.serializer_time, stats.queries
+        )
+        with self._lock:
+            for histogram, value in zip(self.histograms, values):
+                histogram.observe(labels, value)
+
+    def render(self):
+        with self._lock:
+            lines = [
+                line
+                for histogram in self.histograms
+                for line in histogram.render()
+            ]
+        lines += counters.render()
+        return '\n'.join(lines) + '\n'
+
+
+registry = None
+
+
+def get_view_label(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    # Вьюсеты DRF (и их асинхронные обёртки) помнят класс и действия.
+    view_class = getattr(match.func, 'cls', None)
+    actions = getattr(match.func, 'actions', None) or {}
+    if view_class is not None:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{view_class.__name__}.{action}'
+    return match.view_name or match._func_path
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        global registry
+        if registry is None:
+            registry = MetricsRegistry()
+        instrument()
+        self.get_response = get_response
+        self.slow_threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = RequestStats(record_sql=self.slow_threshold is not None)
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats(record_sql=self.slow_threshold is not None)
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        total = time.perf_counter() - stats.started
+        registry.observe(
+            (get_view_label(request), request.method), total, stats
+        )
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={stats.db_time * 1000:.1f};'
+            f'desc="{stats.queries} queries"',
+            f'serialize;dur={stats.serializer_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        if (self.slow_threshold is not None
+                and total * 1000 >= self.slow_threshold):
+            self.log_slow_request(request, total, stats)
+        return response
+
+    @staticmethod
+    def log_slow_request(request, total, stats):
+        slowest = sorted(stats.sql, reverse=True)[
+            :settings.SLOW_REQUEST_LOG_QUERIES
+        ]
+        logger.warning(
+            'Slow request %s %s: %.1f ms, %s queries, db %.1f ms, '
+            'serialize %.1f ms\n%s',
+            request.method, request.get_full_path(), total * 1000,
+            stats.queries, stats.db_time * 1000,
+            stats.serializer_time * 1000,
+            '\n'.join(
+                f'{duration * 1000:.1f} ms: {sql}'
+                for duration, sql in slowest
+            ),
+        )
+
+
+def metrics_view(request):
+    if registry is None:
+        raise Http404
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,84 @@
+"""Чтение с реплик PostgreSQL.
+
+ReplicaMiddleware разрешает чтение с реплики только в безопасных
+запросах (GET, HEAD, OPTIONS). После изменяющего запроса клиент
+получает cookie и DB_REPLICA_PIN_SECONDS читает с основной базы,
+чтобы сразу видеть свои изменения, несмотря на задержку репликации.
+"""
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+class ReplicaMiddleware:
+    # Работает и под ASGI без перехода в синхронный поток.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django 3.2 помечает асинхронные middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = read_from_replica.set(self.can_use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return self.pin_to_primary(request, response)
+
+    async def __acall__(self, request):
+        token = read_from_replica.set(self.can_use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return self.pin_to_primary(request, response)
+
+    @staticmethod
+    def can_use_replica(request):
+        return (request.method in SAFE_METHODS
+                and PIN_COOKIE not in request.COOKIES)
+
+    @staticmethod
+    def pin_to_primary(request, response):
+        if request.method not in SAFE_METHODS and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE,
+                '1',
+                max_age=settings.DB_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class ReplicaRouter:
+    """Чтение в безопасных запросах — со случайной реплики,
+    всё остальное (запись, миграции, команды) — с default."""
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and read_from_replica.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
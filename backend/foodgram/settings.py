@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'recipes.apps.RecipesConfig',
     'customusers.apps.CustomusersConfig',
     'api.apps.ApiConfig',
@@ -40,8 +41,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -50,7 +53,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'foodgram.urls'
+# Под ASGI (foodgram/asgi.py) подключается foodgram.asgi_urls.
+ROOT_URLCONF = os.getenv('DJANGO_ROOT_URLCONF', 'foodgram.urls')
 
 TEMPLATES = [
     {
@@ -73,14 +77,55 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# DB_CONN_MAX_AGE — сколько секунд держать соединение между запросами
+# (0 — закрывать после каждого). При работе через PgBouncer в режиме
+# transaction (DB_POOL_MODE=transaction) серверные курсоры отключаются.
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', '')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'foodgram.db_backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', 'True'
+        ) == 'True',
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOL_MODE == 'transaction',
+    }
+}
+
+# Реплики для чтения: DB_REPLICA_HOSTS=host1,host2:5433. Имя базы,
+# пользователь и пароль те же, что у основной.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(filter(None, os.getenv(
+    'DB_REPLICA_HOSTS', ''
+).split(','))):
+    host, _, port = replica.strip().rpartition(':')
+    if not port.isdigit():
+        host, port = replica.strip(), DATABASES['default']['PORT']
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 10))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -124,6 +169,34 @@ STATIC_ROOT = BASE_DIR / 'backend_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Метрики запросов (Server-Timing и /metrics). Запросы дольше
+# SLOW_REQUEST_THRESHOLD_MS мс пишутся в лог вместе с самыми долгими SQL.
+REQUEST_METRICS_ENABLED = os.getenv(
+    'REQUEST_METRICS_ENABLED', 'False'
+) == 'True'
+REQUEST_METRICS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+SLOW_REQUEST_THRESHOLD_MS = (
+    int(os.getenv('SLOW_REQUEST_THRESHOLD_MS'))
+    if os.getenv('SLOW_REQUEST_THRESHOLD_MS') else None
+)
+SLOW_REQUEST_LOG_QUERIES = int(os.getenv('SLOW_REQUEST_LOG_QUERIES', 10))
+
+# Потоки для асинхронных эндпоинтов чтения под ASGI (api.async_views).
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', 8))
+
+# Потоки для создания уменьшенных копий фотографий рецептов;
+# 0 — создавать их синхронно в запросе.
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.getenv('RECIPE_IMAGE_MAX_PIXELS', 40_000_000)
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -135,10 +208,17 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
+# Кеш токенов авторизации: общий (AUTH_TOKEN_CACHE_TIMEOUT) и в памяти
+# процесса (AUTH_TOKEN_LOCAL_TIMEOUT, 0 — отключить). Выход в другом
+# процессе становится виден не позже AUTH_TOKEN_LOCAL_TIMEOUT секунд.
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 300))
+AUTH_TOKEN_LOCAL_TIMEOUT = int(os.getenv('AUTH_TOKEN_LOCAL_TIMEOUT', 10))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 1024))
+
 AUTH_USER_MODEL = 'customusers.User'
 
 DJOSER = {
@@ -162,3 +242,57 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 DEFAULT_PAGE_SIZE = 6
+
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 30)
+)
+RECIPE_LIST_CACHE_TIMEOUT = int(os.getenv('RECIPE_LIST_CACHE_TIMEOUT', 300))
+
+# Порог оценки планировщика PostgreSQL, выше которого точный COUNT(*)
+# не выполняется; пустое значение отключает оценку.
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = (
+    int(os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD'))
+    if os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD') else None
+)
+
+INGREDIENT_INDEX_ENABLED = os.getenv(
+    'INGREDIENT_INDEX_ENABLED', 'True'
+) == 'True'
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 20))
+
+# Конфигурация полнотекстового поиска PostgreSQL для рецептов.
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', 'russian')
+
+# Сколько ингредиентов можно передать в /api/recipes/match/.
+RECIPE_MATCH_MAX_INGREDIENTS = int(
+    os.getenv('RECIPE_MATCH_MAX_INGREDIENTS', 100)
+)
+# Среди скольких самых новых подходящих рецептов /api/recipes/match/
+# ищет лучшие по доле ингредиентов; пустое значение — среди всех.
+# Частый ингредиент вроде соли есть в большинстве рецептов, и без
+# ограничения доля считается и сортируется для каждого из них.
+RECIPE_MATCH_MAX_CANDIDATES = int(
+    os.getenv('RECIPE_MATCH_MAX_CANDIDATES', 5000) or 0
+) or None
+
+# Сортировка по популярности: вес добавления в избранное падает вдвое
+# за TRENDING_HALF_LIFE_HOURS, старше TRENDING_WINDOW_DAYS не учитывается.
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 48))
+TRENDING_WINDOW_DAYS = int(os.getenv('TRENDING_WINDOW_DAYS', 7))
+TRENDING_REFRESH_MINUTES = int(os.getenv('TRENDING_REFRESH_MINUTES', 15))
+
+# Похожие рецепты: число соседей, размер блока строк при перемножении
+# матриц и доля рецептов, выше которой признак не учитывается.
+SIMILAR_RECIPES_TOP_K = int(os.getenv('SIMILAR_RECIPES_TOP_K', 10))
+SIMILAR_RECIPES_BLOCK_SIZE = int(
+    os.getenv('SIMILAR_RECIPES_BLOCK_SIZE', 1000)
+)
+SIMILAR_RECIPES_MAX_DF = float(os.getenv('SIMILAR_RECIPES_MAX_DF', 0.5))
+SIMILAR_RECIPES_REFRESH_MINUTES = int(
+    os.getenv('SIMILAR_RECIPES_REFRESH_MINUTES', 24 * 60)
+)
+
+SHOP_LIST_PDF_FONT = os.getenv(
+    'SHOP_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
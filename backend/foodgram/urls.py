@@ -3,9 +3,13 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    # Только при REQUEST_METRICS_ENABLED; наружу через gateway не проксируется.
+    path('metrics', metrics_view),
 ]
 
 if settings.DEBUG:
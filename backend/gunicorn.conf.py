@@ -0,0 +1,22 @@
+# Настройки gunicorn из переменных окружения.
+import multiprocessing
+import os
+
+# ASGI: GUNICORN_APP=foodgram.asgi:application
+# и GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker.
+wsgi_app = os.getenv('GUNICORN_APP', 'foodgram.wsgi')
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1
+))
+# gthread с несколькими потоками держит больше запросов на процесс;
+# у каждого потока своё постоянное соединение с базой.
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+worker_class = os.getenv(
+    'GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync'
+)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 2))
+# Перезапуск воркеров ограничивает рост памяти долгоживущих процессов.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 0))
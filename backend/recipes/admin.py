@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.db import transaction
+from django.utils import timezone
 
+from .images import schedule_variants
 from .models import (
     Ingredient,
     Tag,
@@ -7,7 +10,10 @@ from .models import (
     RecipeIngredient,
     FavoriteRecipe,
     ShopList,
+    ShopListIngredient,
 )
+from .search import update_search_fields
+from .versions import bump_recipe_versions
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -29,12 +35,34 @@ class TagAdmin(admin.ModelAdmin):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'author', 'cooking_time',)
+    list_display = ('pk', 'name', 'author', 'cooking_time',
+                    'favorites_count',)
+    readonly_fields = ('favorites_count', 'in_carts_count',
+                       'trending_score',)
     search_fields = ('name', 'author__username',)
     list_filter = ('tags', 'author',)
     inlines = [RecipeIngredientInline]
     empty_value_display = '-пусто-'
 
+    def save_model(self, request, obj, form, change):
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            obj.image_variants_ready = False
+        super().save_model(request, obj, form, change)
+        if image_changed:
+            schedule_variants(obj)
+
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        old_amounts = ShopListIngredient.objects.get_recipe_amounts(recipe)
+        super().save_related(request, form, formsets, change)
+        ShopListIngredient.objects.update_recipe(
+            recipe,
+            old_amounts,
+            ShopListIngredient.objects.get_recipe_amounts(recipe)
+        )
+        update_search_fields(Recipe.objects.filter(pk=recipe.pk))
+
 
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('pk', 'recipe', 'ingredient', 'amount',)
@@ -44,7 +72,61 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
 
     @admin.display(description='Количество добавлений в избранное')
     def number_of_favorites(self, obj):
-        return FavoriteRecipe.objects.filter(recipe=obj).count()
+        return obj.recipe.favorites_count
+
+    @staticmethod
+    @transaction.atomic
+    def change_recipes(recipe_ids, change):
+        """Выполняет change и переносит изменения ингредиентов
+        рецептов в списки покупок и поисковые поля."""
+        recipes = Recipe.objects.filter(pk__in=recipe_ids)
+        old_amounts = {
+            recipe: ShopListIngredient.objects.get_recipe_amounts(recipe)
+            for recipe in recipes
+        }
+        change()
+        for recipe, amounts in old_amounts.items():
+            ShopListIngredient.objects.update_recipe(
+                recipe,
+                amounts,
+                ShopListIngredient.objects.get_recipe_amounts(recipe)
+            )
+            bump_recipe_versions(
+                recipe.author_id, recipe.tags.values_list('slug', flat=True)
+            )
+        # Количества выводятся в рецепте: updated сдвигается для ETag
+        # и Last-Modified.
+        update_search_fields(recipes, updated=timezone.now())
+
+    def save_model(self, request, obj, form, change):
+        # При изменении строку могли перенести в другой рецепт.
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids.update(RecipeIngredient.objects.filter(
+                pk=obj.pk
+            ).values_list('recipe_id', flat=True))
+        self.change_recipes(
+            recipe_ids,
+            lambda: super(RecipeIngredientAdmin, self).save_model(
+                request, obj, form, change
+            )
+        )
+
+    def delete_model(self, request, obj):
+        self.change_recipes(
+            {obj.recipe_id},
+            lambda: super(RecipeIngredientAdmin, self).delete_model(
+                request, obj
+            )
+        )
+
+    def delete_queryset(self, request, queryset):
+        self.change_recipes(
+            set(queryset.values_list('recipe_id', flat=True)),
+            lambda: super(RecipeIngredientAdmin, self).delete_queryset(
+                request, queryset
+            )
+        )
 
 
 class FavoriteRecipeAdmin(admin.ModelAdmin):
@@ -0,0 +1,56 @@
+import threading
+from bisect import bisect_left
+
+from .models import Ingredient
+from .versions import get_version
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Хранит отсортированный список пар (название в нижнем регистре, id):
+    совпадения по префиксу ищутся бинарным поиском, по подстроке —
+    проходом по списку. Строится лениво и перестраивается, когда
+    меняется общая версия справочника ингредиентов.
+    """
+    namespace = 'ingredients'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = None
+
+    def get_entries(self):
+        version = get_version(self.namespace)
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._entries = sorted(
+                        (name.lower(), pk)
+                        for pk, name in Ingredient.objects.values_list(
+                            'pk', 'name'
+                        )
+                    )
+                    self._version = version
+        return self._entries
+
+    def search(self, query, limit):
+        """Возвращает id ингредиентов: сначала по префиксу, затем
+        по подстроке, не больше limit штук."""
+        query = query.lower()
+        entries = self.get_entries()
+        found = []
+        for position in range(bisect_left(entries, (query,)), len(entries)):
+            name, pk = entries[position]
+            if not name.startswith(query) or len(found) == limit:
+                break
+            found.append(pk)
+        for name, pk in entries:
+            if len(found) == limit:
+                break
+            if query in name and not name.startswith(query):
+                found.append(pk)
+        return found
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,38 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def change_counter(queryset, field, delta):
+    """Сдвигает счётчик field у объектов queryset на delta.
+
+    Счётчик не опускается ниже нуля: если он уже разошёлся с данными,
+    вычитание не должно нарушать ограничение PositiveIntegerField.
+    """
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def count_subquery(model, field):
+    """Число строк model, ссылающихся через field на текущий объект."""
+    queryset = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(
+        Subquery(queryset, output_field=IntegerField()), 0
+    )
+
+
+def recount(recipe_model, user_model, favorite_model, shop_list_model,
+            follow_model):
+    """Пересчитывает денормализованные счётчики одним UPDATE на таблицу.
+
+    Модели передаются явно, чтобы функцию можно было вызвать и из
+    миграции с историческими моделями.
+    """
+    recipe_model.objects.update(
+        favorites_count=count_subquery(favorite_model, 'recipe'),
+        in_carts_count=count_subquery(shop_list_model, 'recipe'),
+    )
+    user_model.objects.update(
+        recipes_count=count_subquery(recipe_model, 'author'),
+        followers_count=count_subquery(follow_model, 'author'),
+    )
@@ -0,0 +1,119 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import Recipe
+from .versions import bump_recipe_versions
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipes/images/variants'
+VARIANTS = {
+    'thumbnail': {'size': (300, 300), 'format': 'JPEG', 'extension': 'jpg'},
+    'thumbnail_webp': {
+        'size': (300, 300), 'format': 'WEBP', 'extension': 'webp'
+    },
+    'webp': {'size': (1200, 1200), 'format': 'WEBP', 'extension': 'webp'},
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=max(settings.IMAGE_WORKERS, 1),
+    thread_name_prefix='recipe-images',
+)
+
+
+def get_variant_name(image_name, variant):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return (f'{VARIANTS_DIR}/{stem}_{variant}.'
+            f'{VARIANTS[variant]["extension"]}')
+
+
+def get_image_urls(recipe):
+    """Возвращает ссылки на варианты изображения рецепта.
+
+    Пока варианты не готовы, для всех них отдаётся оригинал.
+    """
+    if not recipe.image:
+        return None
+    if not recipe.image_variants_ready:
+        return {variant: recipe.image.url for variant in VARIANTS}
+    return {
+        variant: default_storage.url(
+            get_variant_name(recipe.image.name, variant)
+        )
+        for variant in VARIANTS
+    }
+
+
+def render_variant(image, variant):
+    options = VARIANTS[variant]
+    resized = image.copy()
+    resized.thumbnail(options['size'])
+    if options['format'] == 'JPEG' and resized.mode != 'RGB':
+        resized = resized.convert('RGB')
+    buffer = BytesIO()
+    resized.save(buffer, options['format'], quality=85)
+    return buffer.getvalue()
+
+
+def generate_variants(recipe_id):
+    """Создаёт варианты изображения рецепта и отмечает их готовность."""
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id).first()
+        if recipe is None or not recipe.image:
+            return
+        image_name = recipe.image.name
+        with recipe.image.open('rb') as file, Image.open(file) as image:
+            image.load()
+            for variant in VARIANTS:
+                variant_name = get_variant_name(image_name, variant)
+                if default_storage.exists(variant_name):
+                    default_storage.delete(variant_name)
+                default_storage.save(
+                    variant_name,
+                    ContentFile(render_variant(image, variant))
+                )
+        # Изображение могло смениться, пока готовились варианты.
+        # Ссылки images в ответе меняются, поэтому сдвигаются updated
+        # и версии списков рецепта.
+        if Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+            image_variants_ready=True,
+            updated=timezone.now(),
+        ):
+            bump_recipe_versions(
+                recipe.author_id, recipe.tags.values_list('slug', flat=True)
+            )
+    except Exception:
+        logger.exception(
+            'Не удалось создать варианты изображения рецепта %s', recipe_id
+        )
+
+
+def generate_variants_in_worker(recipe_id):
+    try:
+        generate_variants(recipe_id)
+    finally:
+        # Соединения с базой данных у каждого потока свои.
+        connection.close()
+
+
+def schedule_variants(recipe):
+    """Ставит создание вариантов в очередь после фиксации транзакции.
+
+    При IMAGE_WORKERS = 0 варианты создаются сразу в текущем потоке.
+    """
+    def submit():
+        if settings.IMAGE_WORKERS:
+            executor.submit(generate_variants_in_worker, recipe.pk)
+        else:
+            generate_variants(recipe.pk)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,50 @@
+import logging
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .popularity import refresh_trending_scores
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_trending_job():
+    # Планировщик живёт долго, соединение с базой могло устареть.
+    close_old_connections()
+    try:
+        updated = refresh_trending_scores()
+        logger.info('Trending scores refreshed for %s recipes', updated)
+    finally:
+        close_old_connections()
+
+
+def refresh_similar_job():
+    # NumPy и SciPy нужны только планировщику.
+    from .similarity import refresh_similar_recipes
+
+    close_old_connections()
+    try:
+        written = refresh_similar_recipes()
+        logger.info('Similar recipes refreshed, %s rows', written)
+    finally:
+        close_old_connections()
+
+
+JOBS = (
+    (refresh_trending_job, 'TRENDING_REFRESH_MINUTES'),
+    (refresh_similar_job, 'SIMILAR_RECIPES_REFRESH_MINUTES'),
+)
+
+
+def register_jobs(scheduler):
+    """Добавляет периодические задачи в планировщик APScheduler."""
+    for job, interval_setting in JOBS:
+        scheduler.add_job(
+            job,
+            'interval',
+            minutes=getattr(settings, interval_setting),
+            id=job.__name__,
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True,
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий фотографий рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии для всех рецептов',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if not options['all']:
+            recipes = recipes.filter(image_variants_ready=False)
+        recipe_ids = list(recipes.values_list('pk', flat=True))
+        for recipe_id in recipe_ids:
+            generate_variants(recipe_id)
+        ready = Recipe.objects.filter(
+            pk__in=recipe_ids, image_variants_ready=True
+        ).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Копии фотографий созданы для {ready} из {len(recipe_ids)} '
+            f'рецептов')
+        )
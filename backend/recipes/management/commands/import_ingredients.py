@@ -3,6 +3,7 @@ import json
 from django.core.management.base import BaseCommand
 
 from recipes.models import Ingredient
+from recipes.versions import bump_version
 
 
 class Command(BaseCommand):
@@ -45,6 +46,7 @@ class Command(BaseCommand):
                     )
 
             Ingredient.objects.bulk_create(ingredients_to_create)
+            bump_version('ingredients')
             self.stdout.write(self.style.SUCCESS(
                 f'Создано {len(ingredients_to_create)} новых ингредиентов')
             )
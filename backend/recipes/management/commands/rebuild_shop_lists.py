@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import ShopListIngredient
+
+
+class Command(BaseCommand):
+    help = 'Пересборка или проверка сохранённых списков покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить списки покупок с рецептами в ShopList',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            return self.check_shop_lists()
+        count = ShopListIngredient.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, строк: {count}')
+        )
+
+    def check_shop_lists(self):
+        expected = {
+            (row['user_id'], row['ingredient_id']): row['total_amount']
+            for row in ShopListIngredient.objects.calculate()
+        }
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShopListIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        }
+        mismatches = [
+            key for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        ]
+        for user_id, ingredient_id in mismatches:
+            self.stdout.write(self.style.WARNING(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидается {expected.get((user_id, ingredient_id), 0)}, '
+                f'сохранено {stored.get((user_id, ingredient_id), 0)}')
+            )
+        if mismatches:
+            self.stdout.write(self.style.ERROR(
+                f'Расхождений: {len(mismatches)}. '
+                f'Запустите команду без --check для пересборки.')
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                'Списки покупок совпадают с рецептами.')
+            )
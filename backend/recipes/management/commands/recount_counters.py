@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from customusers.models import Follow
+from recipes.counters import count_subquery, recount
+from recipes.models import FavoriteRecipe, Recipe, ShopList
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'in_carts_count', ShopList, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Сверка и пересчёт счётчиков избранного, корзин и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать объекты с неверными счётчиками',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            return self.check_counters()
+        with transaction.atomic():
+            recount(Recipe, User, FavoriteRecipe, ShopList, Follow)
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
+
+    def check_counters(self):
+        mismatches = 0
+        for model, counter, related_model, field in COUNTERS:
+            queryset = model.objects.annotate(
+                expected=count_subquery(related_model, field)
+            ).values_list('pk', counter, 'expected')
+            for pk, stored, expected in queryset.iterator():
+                if stored != expected:
+                    mismatches += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'{model._meta.model_name} {pk}, {counter}: '
+                        f'ожидается {expected}, сохранено {stored}')
+                    )
+        if mismatches:
+            self.stdout.write(self.style.ERROR(
+                f'Расхождений: {mismatches}. '
+                f'Запустите команду без --check для пересчёта.')
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS('Счётчики совпадают.'))
@@ -0,0 +1,30 @@
+from apscheduler.schedulers.blocking import BlockingScheduler
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.jobs import JOBS, register_jobs
+
+
+class Command(BaseCommand):
+    help = 'Запуск периодических задач: популярность и похожие рецепты'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить все задачи один раз и выйти',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            for job, _ in JOBS:
+                job()
+            self.stdout.write(self.style.SUCCESS('Задачи выполнены.'))
+            return
+        scheduler = BlockingScheduler(timezone=settings.TIME_ZONE)
+        register_jobs(scheduler)
+        self.stdout.write(self.style.SUCCESS('Планировщик запущен.'))
+        try:
+            scheduler.start()
+        except (KeyboardInterrupt, SystemExit):
+            scheduler.shutdown()
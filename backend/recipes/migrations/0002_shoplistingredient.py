@@ -0,0 +1,61 @@
+# Generated by Django 3.2 on 2026-10-17 05:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F, Sum
+
+
+def fill_shop_list_ingredients(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShopListIngredient = apps.get_model('recipes', 'ShopListIngredient')
+    rows = RecipeIngredient.objects.filter(
+        recipe__shop_list__isnull=False
+    ).values(
+        'ingredient_id',
+        user_id=F('recipe__shop_list__user'),
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by()
+    ShopListIngredient.objects.bulk_create(
+        ShopListIngredient(
+            user_id=row['user_id'],
+            ingredient_id=row['ingredient_id'],
+            amount=row['total_amount'],
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopListIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shop_list_ingredients', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shop_list_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в списке покупок',
+                'verbose_name_plural': 'Ингредиенты в списке покупок',
+                'ordering': ('user', 'ingredient'),
+                'default_related_name': 'shop_list_ingredients',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoplistingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_shop_ingredient'),
+        ),
+        migrations.RunPython(
+            fill_shop_list_ingredients,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2 on 2026-10-17 06:10
+
+from django.db import migrations
+
+INDEX_NAME = 'recipes_ingredient_name_upper_idx'
+
+
+def create_index(apps, schema_editor):
+    # Фильтр name__istartswith в PostgreSQL превращается в
+    # UPPER("name"::text) LIKE UPPER('...%'), обычный btree-индекс
+    # для него не подходит.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON recipes_ingredient '
+        f'(UPPER(name::text) text_pattern_ops)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_shoplistingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-17 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_ingredient_name_upper_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['created', 'id'], name='recipe_created_id_idx'),
+        ),
+    ]
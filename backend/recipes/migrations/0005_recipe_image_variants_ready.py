@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-17 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants_ready',
+            field=models.BooleanField(default=False, verbose_name='Уменьшенные копии фотографии готовы'),
+        ),
+    ]
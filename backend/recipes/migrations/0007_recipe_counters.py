@@ -0,0 +1,37 @@
+# Generated by Django 3.2 on 2026-10-17 05:59
+
+from django.db import migrations, models
+
+from recipes.counters import recount
+
+
+def fill_counters(apps, schema_editor):
+    recount(
+        apps.get_model('recipes', 'Recipe'),
+        apps.get_model('customusers', 'User'),
+        apps.get_model('recipes', 'FavoriteRecipe'),
+        apps.get_model('recipes', 'ShopList'),
+        apps.get_model('customusers', 'Follow'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customusers', '0002_user_counters'),
+        ('recipes', '0006_recipe_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Добавлений в список покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,33 @@
 from colorfield.fields import ColorField
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import OuterRef, Exists
+from django.db import models, transaction
+from django.db.models import (
+    BigIntegerField,
+    Exists,
+    F,
+    FloatField,
+    Func,
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce
+
+from .search import MatchedCount
 
 MAX_LENGTH_TEXT_FIELD = 200
 User = get_user_model()
 
 
-class RecipeManager(models.Manager):
+class RecipeQuerySet(models.QuerySet):
     def with_annotations(self, user):
         favorites_subquery = user.favorite.filter(
             recipe=OuterRef('pk')
@@ -21,6 +40,79 @@ class RecipeManager(models.Manager):
             is_in_shopping_cart=Exists(shoplist_subquery)
         )
 
+    def without_search_fields(self):
+        """Не загружает поисковые поля: они нужны только в SQL
+        фильтров search и matching, сериализаторы их не читают."""
+        return self.defer('search_vector', 'ingredient_ids')
+
+    def for_listing(self, user):
+        """Выборка рецептов для списка за фиксированное число запросов."""
+        queryset = self.without_search_fields().select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+        if user.is_anonymous:
+            return queryset
+        return queryset.with_annotations(user)
+
+    def limited_per_author(self, limit):
+        """Оставляет не больше limit первых рецептов каждого автора.
+
+        Ограничение применяется в самом запросе, поэтому превью рецептов
+        для целой страницы авторов загружаются одним запросом.
+        """
+        queryset = self.without_search_fields()
+        if limit is None:
+            return queryset
+        first_recipes = self.model.objects.filter(
+            author=OuterRef('author')
+        ).values('pk')[:limit]
+        return queryset.filter(pk__in=Subquery(first_recipes))
+
+    def matching(self, ingredient_ids):
+        """Рецепты хотя бы с одним из ингредиентов и долей coverage
+        ингредиентов рецепта, которые есть в ingredient_ids.
+
+        Кандидатов отбирает GIN-индекс по Recipe.ingredient_ids,
+        соединения с RecipeIngredient не нужны. Из них остаются
+        RECIPE_MATCH_MAX_CANDIDATES самых новых: на частом ингредиенте
+        кандидатов сотни тысяч, и сортировать по coverage их все долго.
+        """
+        ids = sorted(set(ingredient_ids))
+        queryset = self.filter(ingredient_ids__overlap=ids)
+        limit = settings.RECIPE_MATCH_MAX_CANDIDATES
+        if limit:
+            # Старше limit-го с конца кандидата ничего не берём: условие
+            # на диапазон id проверяется в том же проходе по индексу.
+            oldest = queryset.order_by('-pk').values('pk')[limit - 1:limit]
+            queryset = queryset.filter(
+                pk__gte=Coalesce(Subquery(oldest), Value(0))
+            )
+        matched = MatchedCount(
+            F('ingredient_ids'),
+            Value(ids, output_field=ArrayField(BigIntegerField())),
+        )
+        total = Func(
+            F('ingredient_ids'),
+            function='CARDINALITY',
+            output_field=IntegerField(),
+        )
+        return queryset.annotate(
+            matched_count=matched,
+            coverage=Cast(matched, FloatField()) / total,
+        )
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    pass
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -96,6 +188,10 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         verbose_name='Фотография',
     )
+    image_variants_ready = models.BooleanField(
+        default=False,
+        verbose_name='Уменьшенные копии фотографии готовы',
+    )
     text = models.TextField(
         verbose_name='Описание',
     )
@@ -108,9 +204,62 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в избранное',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в список покупок',
+    )
+    trending_score = models.FloatField(
+        default=0,
+        verbose_name='Популярность за последнее время',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+    )
+    ingredient_ids = ArrayField(
+        models.BigIntegerField(),
+        default=list,
+        editable=False,
+        verbose_name='Id ингредиентов',
+    )
     objects = RecipeManager()
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['created', 'id'],
+                name='recipe_created_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='recipe_author_created_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                name='recipe_trending_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_idx'
+            ),
+            GinIndex(
+                fields=['ingredient_ids'],
+                name='recipe_ingredient_ids_idx'
+            ),
+        ]
         ordering = ('created',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
@@ -160,6 +309,10 @@ class BaseRecipeRelation(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         abstract = True
@@ -167,6 +320,8 @@ class BaseRecipeRelation(models.Model):
 
 
 class FavoriteRecipe(BaseRecipeRelation):
+    recipe_counter = 'favorites_count'
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -180,6 +335,8 @@ class FavoriteRecipe(BaseRecipeRelation):
 
 
 class ShopList(BaseRecipeRelation):
+    recipe_counter = 'in_carts_count'
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -190,3 +347,191 @@ class ShopList(BaseRecipeRelation):
         verbose_name = 'Рецепт в списке покупок'
         verbose_name_plural = 'Рецепты в списке покупок'
         default_related_name = 'shop_list'
+
+
+class ShopListIngredientManager(models.Manager):
+    @staticmethod
+    def get_recipe_amounts(recipe):
+        """Возвращает словарь {id ингредиента: количество} для рецепта."""
+        return dict(
+            recipe.recipe_ingredients.values_list('ingredient_id', 'amount')
+        )
+
+    @transaction.atomic
+    def apply_changes(self, user_ids, changes):
+        """Прибавляет изменения количеств к спискам покупок пользователей.
+
+        changes — словарь {id ингредиента: изменение количества}.
+        Строки с нулевым итогом удаляются.
+        """
+        changes = {
+            ingredient_id: change
+            for ingredient_id, change in changes.items() if change
+        }
+        if not changes:
+            return
+        # Блокировка пользователей в порядке id: select_for_update ниже
+        # не видит ещё не созданных строк, и два параллельных добавления
+        # в одну корзину иначе создавали бы одну и ту же строку.
+        user_ids = list(User.objects.select_for_update().filter(
+            pk__in=user_ids
+        ).order_by('pk').values_list('pk', flat=True))
+        if not user_ids:
+            return
+
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.select_for_update().filter(
+                user_id__in=user_ids,
+                ingredient_id__in=changes,
+            )
+        }
+        items_to_create, items_to_update, ids_to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, change in changes.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if change > 0:
+                        items_to_create.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=change,
+                        ))
+                    continue
+                item.amount += change
+                if item.amount > 0:
+                    items_to_update.append(item)
+                else:
+                    ids_to_delete.append(item.pk)
+
+        self.bulk_create(items_to_create)
+        self.bulk_update(items_to_update, ['amount'])
+        self.filter(pk__in=ids_to_delete).delete()
+
+    def add_recipe(self, user_id, recipe):
+        self.apply_changes([user_id], self.get_recipe_amounts(recipe))
+
+    def remove_recipe(self, user_id, recipe):
+        self.apply_changes([user_id], {
+            ingredient_id: -amount
+            for ingredient_id, amount
+            in self.get_recipe_amounts(recipe).items()
+        })
+
+    def update_recipe(self, recipe, old_amounts, new_amounts):
+        """Учитывает изменение ингредиентов рецепта во всех списках."""
+        changes = {
+            ingredient_id: (new_amounts.get(ingredient_id, 0)
+                            - old_amounts.get(ingredient_id, 0))
+            for ingredient_id in new_amounts.keys() | old_amounts.keys()
+        }
+        self.apply_changes(
+            recipe.shop_list.values_list('user_id', flat=True),
+            changes
+        )
+
+    @staticmethod
+    def calculate(user_ids=None):
+        """Считает списки покупок заново по рецептам в ShopList."""
+        # Условия в одном filter(), чтобы оба шли по одному соединению
+        # с ShopList и строки не размножались.
+        conditions = {'recipe__shop_list__isnull': False}
+        if user_ids is not None:
+            conditions['recipe__shop_list__user__in'] = user_ids
+        return RecipeIngredient.objects.filter(**conditions).values(
+            'ingredient_id',
+            user_id=F('recipe__shop_list__user'),
+        ).annotate(
+            total_amount=Sum('amount')
+        ).order_by()
+
+    @transaction.atomic
+    def rebuild(self, user_ids=None):
+        """Пересобирает списки покупок; возвращает число строк."""
+        queryset = self.all()
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=user_ids)
+        queryset.delete()
+        items = self.bulk_create(
+            self.model(
+                user_id=row['user_id'],
+                ingredient_id=row['ingredient_id'],
+                amount=row['total_amount'],
+            )
+            for row in self.calculate(user_ids)
+        )
+        return len(items)
+
+
+class ShopListIngredient(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Поддерживается при изменениях ShopList и ингредиентов рецептов,
+    чтобы выгрузка списка покупок не агрегировала рецепты заново.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+    objects = ShopListIngredientManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_shop_ingredient'
+            )
+        ]
+        ordering = ('user', 'ingredient')
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        default_related_name = 'shop_list_ingredients'
+
+
+class RecipeSimilarity(models.Model):
+    """Похожий рецепт из top-K соседей рецепта.
+
+    Заполняется пакетно командой runscheduler (recipes.similarity),
+    чтобы выдача похожих рецептов была одним запросом.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_recipe_similar'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='recipe_similarity_score_idx'
+            ),
+        ]
+        ordering = ('recipe', '-score')
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
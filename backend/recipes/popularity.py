@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    DateTimeField,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce, Extract, Power
+from django.utils import timezone
+
+from .models import FavoriteRecipe, Recipe
+from .versions import bump_version, get_ordering_namespace
+
+
+def decayed_favorites(now):
+    """Сумма избранного за окно, где каждое добавление теряет половину
+    веса за TRENDING_HALF_LIFE_HOURS."""
+    age = ExpressionWrapper(
+        Value(now, output_field=DateTimeField()) - F('created'),
+        output_field=DurationField(),
+    )
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    weights = FavoriteRecipe.objects.filter(
+        recipe=OuterRef('pk'),
+        created__gte=now - timedelta(days=settings.TRENDING_WINDOW_DAYS),
+    ).order_by().values('recipe').annotate(
+        score=Sum(Power(0.5, Extract(age, 'epoch') / half_life))
+    ).values('score')
+    return Coalesce(
+        Subquery(weights, output_field=FloatField()), Value(0.0)
+    )
+
+
+def refresh_trending_scores(now=None):
+    """Пересчитывает trending_score рецептов.
+
+    Обновляются только рецепты с избранным за окно и рецепты, у которых
+    счёт ещё не обнулён, поэтому время работы зависит от активности,
+    а не от размера таблицы.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    with transaction.atomic():
+        updated = Recipe.objects.filter(
+            Q(trending_score__gt=0)
+            | Q(pk__in=FavoriteRecipe.objects.filter(
+                created__gte=since
+            ).values('recipe'))
+        ).update(trending_score=decayed_favorites(now))
+        # trending_score не выводится в ответах: сбрасываются только
+        # кеш и ETag списков с ?ordering=trending.
+        bump_version(get_ordering_namespace('trending'))
+    return updated
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg, StringAgg
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import SearchVector
+from django.db.models import (
+    BigIntegerField,
+    Func,
+    OuterRef,
+    Subquery,
+    TextField,
+    Value,
+)
+from django.db.models.functions import Coalesce
+
+
+def build_search_vector(recipe_ingredients):
+    """tsvector рецепта: название (A), описание (B), ингредиенты (C).
+
+    recipe_ingredients — менеджер RecipeIngredient; передаётся явно,
+    чтобы выражение можно было собрать и в миграции.
+    """
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = recipe_ingredients.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector('text', weight='B', config=config)
+        + SearchVector(
+            Subquery(ingredient_names, output_field=TextField()),
+            weight='C',
+            config=config,
+        )
+    )
+
+
+def build_ingredient_ids(recipe_ingredients):
+    """Отсортированный массив id ингредиентов рецепта."""
+    output_field = ArrayField(BigIntegerField())
+    ingredient_ids = recipe_ingredients.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        ids=ArrayAgg('ingredient_id', ordering='ingredient_id')
+    ).values('ids')
+    return Coalesce(
+        Subquery(ingredient_ids, output_field=output_field),
+        Value([], output_field=output_field),
+    )
+
+
+def update_search_fields(recipes, **fields):
+    """Пересчитывает search_vector и ingredient_ids рецептов
+    из queryset одним UPDATE, в который входят и поля fields."""
+    from .models import RecipeIngredient
+
+    return recipes.update(
+        search_vector=build_search_vector(RecipeIngredient.objects),
+        ingredient_ids=build_ingredient_ids(RecipeIngredient.objects),
+        **fields
+    )
+
+
+class MatchedCount(Func):
+    """Сколько элементов массива-поля входят в переданный массив id."""
+    output_field = BigIntegerField()
+
+    def as_sql(self, compiler, connection):
+        array_sql, array_params = compiler.compile(
+            self.source_expressions[0]
+        )
+        ids_sql, ids_params = compiler.compile(self.source_expressions[1])
+        return (
+            f'(SELECT COUNT(*) FROM unnest({array_sql}) AS item '
+            f'WHERE item = ANY({ids_sql}))',
+            [*array_params, *ids_params],
+        )
@@ -0,0 +1,163 @@
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .counters import change_counter
+from .models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    ShopList,
+    ShopListIngredient,
+    Tag,
+    User,
+)
+from .search import update_search_fields
+from .versions import (
+    bump_recipe_versions,
+    bump_version,
+    get_ordering_namespace,
+    get_tag_namespace,
+    get_user_namespace,
+)
+
+
+@receiver(post_save, sender=ShopList)
+def add_recipe_to_shop_list(sender, instance, created, **kwargs):
+    if created:
+        ShopListIngredient.objects.add_recipe(
+            instance.user_id, instance.recipe
+        )
+
+
+# pre_delete, а не post_delete: при каскадном удалении рецепта его
+# ингредиенты ещё не удалены и их можно вычесть из списка покупок.
+@receiver(pre_delete, sender=ShopList)
+def remove_recipe_from_shop_list(sender, instance, **kwargs):
+    ShopListIngredient.objects.remove_recipe(
+        instance.user_id, instance.recipe
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    bump_version('ingredients')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def update_ingredient_recipes_search(sender, instance, created=False,
+                                     **kwargs):
+    # updated сдвигается, чтобы Last-Modified рецептов учёл новое
+    # название ингредиента.
+    if not created:
+        update_search_fields(
+            Recipe.objects.filter(ingredient_ids__contains=[instance.pk]),
+            updated=timezone.now()
+        )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    bump_version('tags')
+
+
+# pre_delete: после удаления тега его рецепты уже не найти.
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tag_recipes(sender, instance, created=False, **kwargs):
+    if not created:
+        Recipe.objects.filter(tags=instance).update(updated=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+# pre_delete: после удаления рецепта его теги уже не получить.
+@receiver(pre_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    bump_recipe_versions(
+        instance.author_id,
+        instance.tags.values_list('slug', flat=True)
+    )
+
+
+# Ингредиенты меняются пакетно без сигналов, поэтому после их
+# изменения вектор обновляют RecipeCreateSerializer и RecipeAdmin.
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(sender, instance, **kwargs):
+    update_search_fields(Recipe.objects.filter(pk=instance.pk))
+
+
+# Счётчики ведутся в сигналах, чтобы их не обходили админка
+# и каскадное удаление пользователей и рецептов.
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShopList)
+def increase_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            sender.recipe_counter, 1
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShopList)
+def decrease_recipe_counter(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id),
+        sender.recipe_counter, -1
+    )
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+def invalidate_popular_recipes(sender, **kwargs):
+    bump_version(get_ordering_namespace('popular'))
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShopList)
+@receiver(post_delete, sender=ShopList)
+def invalidate_user_relations(sender, instance, **kwargs):
+    bump_version(get_user_namespace(instance.user_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # Изменились рецепты тега instance.
+        recipes = instance.recipes.all()
+        if pk_set is not None:
+            recipes = Recipe.objects.filter(pk__in=pk_set)
+        bump_version(get_tag_namespace(instance.slug))
+        for author_id in recipes.values_list('author_id', flat=True):
+            bump_recipe_versions(author_id, ())
+        return
+    tags = instance.tags.all()
+    if pk_set is not None:
+        tags = Tag.objects.filter(pk__in=pk_set)
+    bump_recipe_versions(
+        instance.author_id, tags.values_list('slug', flat=True)
+    )
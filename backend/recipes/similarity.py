@@ -0,0 +1,158 @@
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from .models import Recipe, RecipeIngredient, RecipeSimilarity
+
+PAIRS_CHUNK_SIZE = 10000
+
+
+def fetch_pairs(queryset):
+    """Пары (id рецепта, id признака) в виде массива n x 2."""
+    flat = np.fromiter(
+        chain.from_iterable(queryset.iterator(chunk_size=PAIRS_CHUNK_SIZE)),
+        dtype=np.int64,
+    )
+    return flat.reshape(-1, 2)
+
+
+def weighted_features(pairs, recipe_ids, max_df=None):
+    """Матрица рецепт x признак из пар (id рецепта, id признака).
+
+    Присутствие признака взвешивается по IDF; признаки, которые есть
+    больше чем у доли max_df рецептов, отбрасываются.
+    """
+    feature_ids, cols = np.unique(pairs[:, 1], return_inverse=True)
+    rows = pairs[:, 0]
+    # Рецепты, созданные после выборки recipe_ids, пропускаем.
+    known = np.isin(rows, recipe_ids)
+    rows = np.searchsorted(recipe_ids, rows[known])
+    cols = cols[known]
+    features = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(recipe_ids), len(feature_ids)),
+    )
+    features.data[:] = 1
+
+    count = len(recipe_ids)
+    document_frequency = features.getnnz(axis=0)
+    idf = np.log((1 + count) / (1 + document_frequency)) + 1
+    if max_df is not None:
+        idf[document_frequency > max_df * count] = 0
+    return features @ sparse.diags(idf.astype(np.float32))
+
+
+def build_features(recipe_ids):
+    """Матрицы рецепт x ингредиент и рецепт x тег.
+
+    Строки нормируются по обоим признакам вместе, поэтому сумма
+    произведений строк двух матриц — косинусное сходство рецептов.
+    Матрицы раздельные: тегов мало и каждый есть у большой доли
+    рецептов, так что произведение по ним было бы почти плотным.
+    """
+    ingredients = weighted_features(
+        fetch_pairs(RecipeIngredient.objects.order_by().values_list(
+            'recipe_id', 'ingredient_id'
+        )),
+        recipe_ids,
+        # Слишком частые ингредиенты (соль, вода) почти не различают
+        # рецепты, но делают произведение матриц плотным.
+        max_df=settings.SIMILAR_RECIPES_MAX_DF,
+    )
+    tags = weighted_features(
+        fetch_pairs(Recipe.tags.through.objects.order_by().values_list(
+            'recipe_id', 'tag_id'
+        )),
+        recipe_ids,
+    )
+
+    norms = np.sqrt(
+        np.asarray(ingredients.multiply(ingredients).sum(axis=1))
+        + np.asarray(tags.multiply(tags).sum(axis=1))
+    ).ravel()
+    norms[norms == 0] = 1
+    scale = sparse.diags(1 / norms)
+    return (scale @ ingredients).tocsr(), (scale @ tags).tocsr()
+
+
+def block_scores(ingredients, ingredients_t, tags, offset, block_size):
+    """Сходства строк блока со всеми рецептами.
+
+    Кандидаты — рецепты с общими ингредиентами из разреженного
+    произведения; вклад тегов добавляется только к ним.
+    """
+    scores = (ingredients[offset:offset + block_size] @ ingredients_t).tocsr()
+    rows = offset + np.repeat(
+        np.arange(scores.shape[0]), np.diff(scores.indptr)
+    )
+    scores.data += np.asarray(
+        tags[rows].multiply(tags[scores.indices]).sum(axis=1)
+    ).ravel()
+    return scores
+
+
+def top_neighbors(scores, offset, top_k):
+    """Для каждой строки блока сходств — до top_k лучших соседей
+    без самого рецепта: (строка, столбец, сходство)."""
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        cols = scores.indices[start:end]
+        values = scores.data[start:end]
+        keep = (cols != offset + row) & (values > 0)
+        cols, values = cols[keep], values[keep]
+        if len(values) > top_k:
+            best = np.argpartition(-values, top_k)[:top_k]
+            cols, values = cols[best], values[best]
+        order = np.lexsort((cols, -values))
+        for col, value in zip(cols[order], values[order]):
+            yield row, col, float(value)
+
+
+def refresh_similar_recipes():
+    """Пересчитывает top-K похожих рецептов блоками по
+    SIMILAR_RECIPES_BLOCK_SIZE строк. Возвращает число записей."""
+    recipe_ids = np.fromiter(
+        Recipe.objects.order_by('pk').values_list('pk', flat=True),
+        dtype=np.int64,
+    )
+    if not len(recipe_ids):
+        return 0
+    ingredients, tags = build_features(recipe_ids)
+    ingredients_t = ingredients.T.tocsr()
+    block_size = settings.SIMILAR_RECIPES_BLOCK_SIZE
+    written = 0
+    for offset in range(0, len(recipe_ids), block_size):
+        scores = block_scores(
+            ingredients, ingredients_t, tags, offset, block_size
+        )
+        neighbors = [
+            (int(recipe_ids[offset + row]), int(recipe_ids[col]), score)
+            for row, col, score in top_neighbors(
+                scores, offset, settings.SIMILAR_RECIPES_TOP_K
+            )
+        ]
+        written += save_block(
+            recipe_ids[offset:offset + block_size].tolist(), neighbors
+        )
+    return written
+
+
+@transaction.atomic
+def save_block(block_ids, neighbors):
+    # Рецепты могли удалить, пока считалась матрица.
+    existing = set(Recipe.objects.filter(
+        pk__in={pk for pair in neighbors for pk in pair[:2]}
+    ).values_list('pk', flat=True))
+    RecipeSimilarity.objects.filter(recipe_id__in=block_ids).delete()
+    return len(RecipeSimilarity.objects.bulk_create(
+        (
+            RecipeSimilarity(recipe_id=recipe_id, similar_id=similar_id,
+                             score=score)
+            for recipe_id, similar_id, score in neighbors
+            if recipe_id in existing and similar_id in existing
+        ),
+        batch_size=1000,
+    ))
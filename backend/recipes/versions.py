@@ -0,0 +1,61 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'foodgram:version:{}'
+
+
+def get_version(namespace):
+    """Возвращает текущую версию данных из общего кеша.
+
+    Версия — случайная метка, общая для всех процессов. Её смена
+    означает, что закешированные данные пространства устарели.
+    """
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """Меняет версию после фиксации транзакции, чтобы другие процессы
+    не закешировали данные, которые ещё не видны в базе."""
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY.format(namespace), uuid4().hex, None)
+    )
+
+
+def get_user_namespace(user_id):
+    """Пространство версий избранного, покупок и подписок пользователя."""
+    return f'user:{user_id}'
+
+
+def get_author_namespace(author_id):
+    return f'recipes:author:{author_id}'
+
+
+def get_tag_namespace(slug):
+    return f'recipes:tag:{slug}'
+
+
+def get_ordering_namespace(ordering):
+    """Пространство версий порядка списка рецептов (?ordering=...).
+
+    Популярность меняется без изменения самих рецептов, поэтому
+    такие списки сбрасываются отдельно от версий автора и тегов.
+    """
+    return f'recipes:ordering:{ordering}'
+
+
+def bump_recipe_versions(author_id, tag_slugs):
+    """Сбрасывает версии всех списков рецептов, куда попадает рецепт:
+    общего, списка автора и списков его тегов."""
+    # Общая версия совпадает с Recipe._meta.label_lower, по которой
+    # CachedCountPaginator сбрасывает счётчики.
+    bump_version('recipes.recipe')
+    bump_version(get_author_namespace(author_id))
+    for slug in tag_slugs:
+        bump_version(get_tag_namespace(slug))
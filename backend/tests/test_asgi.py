@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+from django.test import AsyncClient
+from rest_framework.authtoken.models import Token
+
+from recipes.models import ShopList
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.mark.parametrize('file_format', ['txt', 'csv', 'pdf'])
+def test_download_shopping_cart_under_asgi(settings, user, create_recipes,
+                                           file_format):
+    settings.ROOT_URLCONF = 'foodgram.asgi_urls'
+    recipe, = create_recipes(1)
+    ShopList.objects.create(user=user, recipe=recipe)
+    token = Token.objects.create(user=user)
+
+    async def download():
+        response = await AsyncClient().get(
+            '/api/recipes/download_shopping_cart/',
+            {'format': file_format},
+            authorization=f'Token {token.key}',
+        )
+        # ASGIHandler перебирает потоковый ответ в цикле событий.
+        return response, b''.join(response.streaming_content)
+
+    response, content = asyncio.run(download())
+    assert response.status_code == 200
+    assert content
+    if file_format != 'pdf':
+        assert 'Ингредиент 0' in content.decode()
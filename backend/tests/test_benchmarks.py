@@ -0,0 +1,153 @@
+"""Замеры подбора и поиска рецептов на синтетических данных.
+
+Запускаются только с переменной BENCHMARK_RECIPES — числом рецептов:
+
+    BENCHMARK_RECIPES=1000000 pytest tests/test_benchmarks.py -s
+
+Ингредиенты в рецептах распределены неравномерно: три ингредиента с
+наименьшими id вместе есть в большинстве рецептов, как соль или мука.
+Время подбора по ингредиентам сравнивается с BENCHMARK_MAX_MS
+(по умолчанию 50 мс); для поиска время и план только печатаются.
+"""
+import os
+import time
+
+import pytest
+from django.conf import settings
+from django.db import connection
+
+from api.filters import RecipeFilter
+from api.views import MATCH_ORDERING
+from customusers.models import User
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+RECIPES = int(os.getenv('BENCHMARK_RECIPES', 0))
+MAX_MS = float(os.getenv('BENCHMARK_MAX_MS', 50))
+INGREDIENTS = 2000
+INGREDIENTS_PER_RECIPE = 8
+PAGE_SIZE = 6
+RUNS = 5
+WORDS = (
+    'борщ', 'суп', 'салат', 'пирог', 'каша', 'омлет', 'плов', 'рагу',
+    'блины', 'котлеты', 'запеканка', 'паста', 'соус', 'кекс', 'уха',
+)
+
+pytestmark = [
+    pytest.mark.skipif(not RECIPES, reason='BENCHMARK_RECIPES не задан'),
+    pytest.mark.django_db,
+]
+
+
+def generate(author):
+    """Заполняет базу синтетическими рецептами запросами INSERT ... SELECT.
+
+    search_vector и ingredient_ids считаются одним UPDATE с группировкой
+    так же, как в recipes.search: коррелированные подзапросы
+    update_search_fields на миллионе строк идут слишком долго.
+    """
+    words = 'ARRAY[%s]' % ', '.join(f"'{word}'" for word in WORDS)
+    recipes = Recipe._meta.db_table
+    ingredients = Ingredient._meta.db_table
+    recipe_ingredients = RecipeIngredient._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ingredients} (name, measurement_unit) '
+            f"SELECT ({words})[i %% {len(WORDS)} + 1] || ' ' || i, 'г' "
+            'FROM generate_series(1, %s) AS i',
+            [INGREDIENTS],
+        )
+        cursor.execute(
+            f'INSERT INTO {recipes} '
+            '(author_id, name, image, image_variants_ready, text, '
+            'cooking_time, created, updated, favorites_count, '
+            'in_carts_count, trending_score, ingredient_ids) '
+            f"SELECT %s, ({words})[i %% {len(WORDS)} + 1] || ' ' || i, "
+            "'recipes/images/benchmark.png', false, "
+            f"'Рецепт ' || ({words})[i %% 7 + 1], 10, "
+            "now() - i * interval '1 minute', now(), 0, 0, 0, '{}' "
+            'FROM generate_series(1, %s) AS i',
+            [author.id, RECIPES],
+        )
+        # random() в кубе смещает выбор к ингредиентам с малыми id.
+        cursor.execute(
+            f'INSERT INTO {recipe_ingredients} '
+            '(recipe_id, ingredient_id, amount) '
+            'SELECT r.id, i.min_id + floor(%s * power(random(), 3))::int, 1 '
+            f'FROM {recipes} AS r, '
+            f'(SELECT min(id) AS min_id FROM {ingredients}) AS i, '
+            'generate_series(1, %s) '
+            'ON CONFLICT DO NOTHING',
+            [INGREDIENTS, INGREDIENTS_PER_RECIPE],
+        )
+        cursor.execute(
+            f'UPDATE {recipes} AS r SET ingredient_ids = s.ids, '
+            'search_vector = '
+            "setweight(to_tsvector(%(config)s, r.name), 'A') "
+            "|| setweight(to_tsvector(%(config)s, r.text), 'B') "
+            "|| setweight(to_tsvector(%(config)s, s.names), 'C') "
+            'FROM (SELECT ri.recipe_id, '
+            'array_agg(ri.ingredient_id ORDER BY ri.ingredient_id) AS ids, '
+            "string_agg(i.name, ' ') AS names "
+            f'FROM {recipe_ingredients} AS ri '
+            f'JOIN {ingredients} AS i ON i.id = ri.ingredient_id '
+            'GROUP BY ri.recipe_id) AS s '
+            'WHERE s.recipe_id = r.id',
+            {'config': settings.RECIPE_SEARCH_CONFIG},
+        )
+        cursor.execute(f'ANALYZE {recipes}')
+    return list(
+        Ingredient.objects.order_by('id').values_list('id', flat=True)
+    )
+
+
+@pytest.fixture(scope='module')
+def ingredient_ids(django_db_setup, django_db_blocker):
+    # Данные создаются один раз на модуль, вне транзакции теста.
+    with django_db_blocker.unblock():
+        author = User.objects.create_user(
+            email='benchmark@foodgram.ru',
+            username='benchmark',
+            password='Password-123',
+        )
+        yield generate(author)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'TRUNCATE {Recipe._meta.db_table}, '
+                f'{Ingredient._meta.db_table} CASCADE'
+            )
+        author.delete()
+
+
+def measure(queryset):
+    """Лучшее время первой страницы в мс и план запроса."""
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        list(queryset[:PAGE_SIZE])
+        timings.append((time.perf_counter() - start) * 1000)
+    plan = queryset[:PAGE_SIZE].explain(analyze=True, buffers=True)
+    print(f'\n{queryset.query}\n{plan}\nлучшее время: {min(timings):.1f} мс')
+    return min(timings)
+
+
+@pytest.mark.parametrize('case', ('common', 'rare'))
+def test_matching(ingredient_ids, case):
+    # Самый частый ингредиент с двумя соседями либо три самых редких.
+    if case == 'common':
+        chosen = ingredient_ids[:3]
+    else:
+        chosen = ingredient_ids[-3:]
+    queryset = Recipe.objects.without_search_fields().matching(
+        chosen
+    ).order_by(*MATCH_ORDERING)
+    assert measure(queryset) < MAX_MS
+
+
+# Слово из половины рецептов и сочетание из нескольких процентов.
+@pytest.mark.parametrize('value', ('борщ', 'уха 14'))
+def test_search(ingredient_ids, value):
+    queryset = RecipeFilter().filter_search(
+        Recipe.objects.without_search_fields(), 'search', value
+    )
+    measure(queryset)
+    assert queryset.exists()
@@ -0,0 +1,82 @@
+import time
+from io import BytesIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.mark.parametrize('recipe_id', ['abc', '999999'])
+def test_recipe_detail_not_found(api_client, user_client, recipe_id):
+    for client in (api_client, user_client):
+        response = client.get(f'/api/recipes/{recipe_id}/')
+        assert response.status_code == 404
+
+
+@pytest.fixture
+def recipe(create_recipes, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    recipe, = create_recipes(1)
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), 'red').save(buffer, 'PNG')
+    recipe.image = default_storage.save(
+        'recipes/images/recipe.png', ContentFile(buffer.getvalue())
+    )
+    Recipe.objects.filter(pk=recipe.pk).update(image=recipe.image.name)
+    return recipe
+
+
+def get_validators(client, recipe):
+    response = client.get(f'/api/recipes/{recipe.id}/')
+    assert response.status_code == 200
+    return response['ETag'], response['Last-Modified'], response.json()
+
+
+def test_image_variants_change_validators(api_client, recipe):
+    etag, last_modified, data = get_validators(api_client, recipe)
+    list_etag = api_client.get('/api/recipes/')['ETag']
+    time.sleep(1)
+
+    generate_variants(recipe.id)
+
+    new_etag, new_last_modified, new_data = get_validators(
+        api_client, recipe
+    )
+    assert new_etag != etag
+    assert new_last_modified != last_modified
+    assert new_data['images'] != data['images']
+    assert api_client.get('/api/recipes/')['ETag'] != list_etag
+
+
+def test_admin_ingredient_edit_changes_validators(api_client, client,
+                                                  django_user_model, recipe):
+    admin = django_user_model.objects.create_superuser(
+        email='admin@foodgram.ru', username='admin', password='Password-123',
+        first_name='Админ', last_name='Админов',
+    )
+    client.force_login(admin)
+    etag, last_modified, data = get_validators(api_client, recipe)
+    cached = api_client.get('/api/recipes/').json()
+    time.sleep(1)
+
+    recipe_ingredient = recipe.recipe_ingredients.first()
+    response = client.post(
+        f'/admin/recipes/recipeingredient/{recipe_ingredient.id}/change/',
+        {'recipe': recipe.id, 'ingredient': recipe_ingredient.ingredient_id,
+         'amount': 999},
+    )
+    assert response.status_code == 302
+
+    new_etag, new_last_modified, new_data = get_validators(
+        api_client, recipe
+    )
+    assert new_etag != etag
+    assert new_last_modified != last_modified
+    assert 999 in [item['amount'] for item in new_data['ingredients']]
+    assert api_client.get('/api/recipes/').json() != cached
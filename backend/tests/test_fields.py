@@ -0,0 +1,35 @@
+import base64
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from api.fields import BASE64_CHUNK_SIZE, StreamingBase64ImageField
+
+
+@pytest.fixture
+def png():
+    # Шум почти не сжимается: файл больше нескольких кусков base64.
+    buffer = BytesIO()
+    Image.frombytes('RGB', (300, 300), os.urandom(300 * 300 * 3)).save(
+        buffer, 'PNG'
+    )
+    content = buffer.getvalue()
+    assert len(content) > 3 * BASE64_CHUNK_SIZE
+    return content
+
+
+@pytest.mark.parametrize('encode', [
+    base64.b64encode,
+    # Base64 в стиле MIME: строки по 76 символов.
+    base64.encodebytes,
+    lambda content: base64.b64encode(content).replace(b'A', b'A\r\n'),
+])
+def test_streaming_base64_image_field_decodes(png, encode):
+    data = 'data:image/png;base64,' + encode(png).decode()
+
+    uploaded = StreamingBase64ImageField().to_internal_value(data)
+
+    assert uploaded.read() == png
+    assert uploaded.content_type == 'image/png'
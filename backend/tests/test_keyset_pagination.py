@@ -0,0 +1,99 @@
+import json
+from base64 import b64encode
+
+import pytest
+
+from recipes.models import Recipe, RecipeIngredient
+from recipes.search import update_search_fields
+
+pytestmark = pytest.mark.django_db
+
+PAGE_SIZE = 4
+
+
+def walk_pages(client, url):
+    """Проходит страницы вперёд по next и обратно по previous."""
+    response = client.get(url).json()
+    forward = [recipe['id'] for recipe in response['results']]
+    while response['next']:
+        response = client.get(response['next']).json()
+        forward += [recipe['id'] for recipe in response['results']]
+    backward = [recipe['id'] for recipe in response['results']]
+    while response['previous']:
+        response = client.get(response['previous']).json()
+        backward = [recipe['id'] for recipe in response['results']] + backward
+    return forward, backward
+
+
+@pytest.mark.parametrize('ordering, field', [
+    ('popular', 'favorites_count'),
+    ('trending', 'trending_score'),
+])
+def test_cursor_pages_with_tied_ordering(user_client, create_recipes,
+                                         ordering, field):
+    ids = [recipe.pk for recipe in create_recipes(23)]
+    # Большинство рецептов с нулевым значением, часть совпадает.
+    Recipe.objects.filter(pk__in=ids[:5]).update(**{field: 2})
+    Recipe.objects.filter(pk__in=ids[5:9]).update(**{field: 1})
+    expected = list(Recipe.objects.order_by(
+        f'-{field}', '-id'
+    ).values_list('id', flat=True))
+
+    forward, backward = walk_pages(
+        user_client,
+        f'/api/recipes/?ordering={ordering}&pagination=cursor'
+        f'&limit={PAGE_SIZE}'
+    )
+    assert forward == expected
+    assert backward == expected
+
+
+def test_cursor_pages_with_tied_coverage(user_client, create_recipes,
+                                         ingredients):
+    recipes = create_recipes(19)
+    # У части рецептов убираем ингредиент: доля совпадений 1.0 и 0.5
+    # вместо 2/3, остальные значения совпадают.
+    RecipeIngredient.objects.filter(
+        recipe__in=recipes[:6], ingredient=ingredients[2]
+    ).delete()
+    RecipeIngredient.objects.filter(
+        recipe__in=recipes[6:10], ingredient=ingredients[1]
+    ).delete()
+    update_search_fields(Recipe.objects.all())
+    wanted = [ingredients[0].id, ingredients[1].id]
+    expected = list(Recipe.objects.matching(wanted).order_by(
+        '-coverage', '-id'
+    ).values_list('id', flat=True))
+
+    forward, backward = walk_pages(
+        user_client,
+        f'/api/recipes/match/?ingredients={wanted[0]}'
+        f'&ingredients={wanted[1]}&pagination=cursor&limit={PAGE_SIZE}'
+    )
+    assert len(expected) == len(recipes)
+    assert forward == expected
+    assert backward == expected
+
+
+def test_invalid_cursor(user_client):
+    response = user_client.get('/api/recipes/?cursor=invalid')
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize('position', [
+    [{'x': 1}, 1],
+    [[1], 1],
+    [True, 1],
+    ['abc', 1],
+    [None, 1],
+    [0, 'abc'],
+    [0, float('inf')],
+])
+def test_tampered_cursor(user_client, create_recipes, position):
+    create_recipes(2)
+    cursor = b64encode(json.dumps({'r': 0, 'p': position}).encode())
+    response = user_client.get(
+        '/api/recipes/',
+        {'ordering': 'popular', 'cursor': cursor.decode()}
+    )
+    assert response.status_code == 404
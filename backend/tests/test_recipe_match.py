@@ -0,0 +1,43 @@
+import pytest
+
+from recipes.models import Recipe, RecipeIngredient
+from recipes.search import update_search_fields
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipes(create_recipes, ingredients):
+    recipes = create_recipes(6)
+    # У самого старого рецепта есть только первый ингредиент,
+    # у самого нового его нет вовсе.
+    RecipeIngredient.objects.filter(
+        recipe=recipes[0], ingredient__in=ingredients[1:]
+    ).delete()
+    RecipeIngredient.objects.filter(
+        recipe=recipes[-1], ingredient=ingredients[0]
+    ).delete()
+    update_search_fields(Recipe.objects.all())
+    return recipes
+
+
+def match_ids(client, ingredient):
+    response = client.get(f'/api/recipes/match/?ingredients={ingredient.id}')
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+def test_match_without_candidate_limit(user_client, settings, recipes,
+                                       ingredients):
+    settings.RECIPE_MATCH_MAX_CANDIDATES = None
+    assert match_ids(user_client, ingredients[0]) == [
+        recipe.id for recipe in [recipes[0], *reversed(recipes[1:-1])]
+    ]
+
+
+def test_match_ranks_newest_candidates(user_client, settings, recipes,
+                                       ingredients):
+    settings.RECIPE_MATCH_MAX_CANDIDATES = 3
+    assert match_ids(user_client, ingredients[0]) == [
+        recipe.id for recipe in reversed(recipes[2:5])
+    ]
@@ -0,0 +1,44 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = pytest.mark.django_db
+
+PAGE_SIZES = (6, 50, 500)
+# Варианты фильтра tags, число рецептов, рецепты страницы,
+# их теги и ингредиенты.
+ANONYMOUS_LIST_QUERIES = 5
+# Плюс множество авторов, на которых подписан пользователь.
+AUTHENTICATED_LIST_QUERIES = 6
+
+
+@pytest.mark.parametrize('page_size', PAGE_SIZES)
+def test_recipe_list_queries_anonymous(api_client, create_recipes,
+                                       django_assert_num_queries,
+                                       page_size):
+    create_recipes(page_size)
+    with django_assert_num_queries(ANONYMOUS_LIST_QUERIES):
+        response = api_client.get(f'/api/recipes/?limit={page_size}')
+    assert response.status_code == 200
+    assert len(response.json()['results']) == page_size
+
+
+@pytest.mark.parametrize('page_size', PAGE_SIZES)
+def test_recipe_list_queries_authenticated(user_client, create_recipes,
+                                           django_assert_num_queries,
+                                           page_size):
+    create_recipes(page_size)
+    with django_assert_num_queries(AUTHENTICATED_LIST_QUERIES):
+        response = user_client.get(f'/api/recipes/?limit={page_size}')
+    assert response.status_code == 200
+    assert len(response.json()['results']) == page_size
+
+
+def test_recipe_list_skips_search_fields(user_client, create_recipes):
+    create_recipes(2)
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get('/api/recipes/')
+    assert response.status_code == 200
+    for query in context.captured_queries:
+        assert 'search_vector' not in query['sql']
+        assert 'ingredient_ids' not in query['sql']
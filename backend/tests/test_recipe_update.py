@@ -0,0 +1,66 @@
+import pytest
+
+from recipes.models import RecipeIngredient, ShopList, ShopListIngredient
+
+pytestmark = pytest.mark.django_db
+
+# Новые количества ингредиентов рецепта (номер ингредиента: количество)
+# и число запросов на PATCH. Исходные количества — 10, 11 и 12.
+EDITS = {
+    'none': ({0: 10, 1: 11, 2: 12}, 21),
+    'one': ({0: 10, 1: 15, 2: 12}, 25),
+    'all': ({0: 20, 3: 5, 4: 7}, 29),
+}
+
+
+def get_cart(user):
+    return dict(ShopListIngredient.objects.filter(
+        user=user
+    ).values_list('ingredient_id', 'amount'))
+
+
+@pytest.mark.parametrize('edit', EDITS)
+def test_recipe_edit_updates_carts(author_client, user, author,
+                                   create_recipes, ingredients, tags,
+                                   django_assert_num_queries, edit):
+    recipe, other_recipe = create_recipes(2)
+    ShopList.objects.create(user=user, recipe=recipe)
+    ShopList.objects.create(user=user, recipe=other_recipe)
+    ShopList.objects.create(user=author, recipe=recipe)
+    new_amounts, queries = EDITS[edit]
+    amounts = {ingredients[number].id: amount
+               for number, amount in new_amounts.items()}
+
+    with django_assert_num_queries(queries):
+        response = author_client.patch(
+            f'/api/recipes/{recipe.id}/',
+            {
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': amount}
+                    for ingredient_id, amount in amounts.items()
+                ],
+                'tags': [tag.id for tag in tags[:2]],
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+            },
+            format='json'
+        )
+    assert response.status_code == 200, response.content
+    assert dict(RecipeIngredient.objects.filter(
+        recipe=recipe
+    ).values_list('ingredient_id', 'amount')) == amounts
+    other_amounts = dict(RecipeIngredient.objects.filter(
+        recipe=other_recipe
+    ).values_list('ingredient_id', 'amount'))
+    expected = {
+        ingredient_id: (amounts.get(ingredient_id, 0)
+                        + other_amounts.get(ingredient_id, 0))
+        for ingredient_id in amounts.keys() | other_amounts.keys()
+    }
+    assert get_cart(user) == expected
+    assert get_cart(author) == amounts
+    assert get_cart(user) == {
+        row['ingredient_id']: row['total_amount']
+        for row in ShopListIngredient.objects.calculate([user.id])
+    }
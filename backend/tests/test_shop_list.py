@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+from django.db import connection
+
+from recipes.models import ShopList, ShopListIngredient
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_cart_additions_share_ingredients(user, create_recipes):
+    recipes = create_recipes(2)
+    barrier = threading.Barrier(len(recipes))
+    errors = []
+
+    def add_to_cart(recipe):
+        try:
+            barrier.wait()
+            ShopList.objects.create(user=user, recipe=recipe)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=add_to_cart, args=(recipe,))
+        for recipe in recipes
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    # Оба рецепта с ингредиентами по 10, 11 и 12.
+    assert sorted(ShopListIngredient.objects.filter(
+        user=user
+    ).values_list('amount', flat=True)) == [20, 22, 24]
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from recipes.models import Recipe, RecipeIngredient, RecipeSimilarity
+from recipes.similarity import (
+    block_scores,
+    build_features,
+    refresh_similar_recipes,
+)
+from recipes.search import update_search_fields
+
+pytestmark = pytest.mark.django_db
+
+# Номера ингредиентов рецептов; теги у всех рецептов общие.
+INGREDIENT_SETS = [[0, 1, 2], [0, 1, 3], [3, 4], [4]]
+
+
+@pytest.fixture
+def recipes(create_recipes, ingredients):
+    recipes = create_recipes(len(INGREDIENT_SETS))
+    RecipeIngredient.objects.all().delete()
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredients[number],
+                         amount=1)
+        for recipe, numbers in zip(recipes, INGREDIENT_SETS)
+        for number in numbers
+    )
+    update_search_fields(Recipe.objects.all())
+    return recipes
+
+
+def test_tags_do_not_add_candidates(recipes, settings):
+    settings.SIMILAR_RECIPES_MAX_DF = 1.0
+    recipe_ids = np.array([recipe.pk for recipe in recipes])
+    ingredients, tags = build_features(recipe_ids)
+
+    scores = block_scores(
+        ingredients, ingredients.T.tocsr(), tags, 0, len(recipes)
+    ).toarray()
+
+    # Рецепты 0 и 3 делят только теги: пары нет.
+    assert scores[0, 3] == 0
+    # Для кандидатов сходство учитывает и ингредиенты, и теги.
+    full = np.hstack([ingredients.toarray(), tags.toarray()])
+    expected = full @ full.T
+    candidates = scores != 0
+    assert np.allclose(scores[candidates], expected[candidates])
+
+
+def test_refresh_similar_recipes(recipes, settings):
+    settings.SIMILAR_RECIPES_MAX_DF = 1.0
+    settings.SIMILAR_RECIPES_BLOCK_SIZE = 2
+
+    refresh_similar_recipes()
+
+    first, second, third, fourth = recipes
+    assert list(RecipeSimilarity.objects.filter(
+        recipe=first
+    ).values_list('similar', flat=True)) == [second.pk]
+    assert set(RecipeSimilarity.objects.filter(
+        recipe=third
+    ).values_list('similar', flat=True)) == {second.pk, fourth.pk}